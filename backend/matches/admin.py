@@ -14,6 +14,8 @@ class MatchAdmin(admin.ModelAdmin):
         "start_time",
         "max_turn_override",
         "world_seed",
+        "terrain_version",
+        "lazy_chunk_radius",
     )
     list_filter = ("status",)
     search_fields = ("name",)
@@ -0,0 +1,224 @@
+"""Resolve a run of turns against match state loaded once into memory.
+
+``MemoryMatchStore`` answers the same questions as ``resolution.MatchStore``
+from dictionaries filled by a handful of queries, and collects every save so
+``flush`` can write them back with one ``bulk_update`` per model. Turns go
+through ``resolve_turn_with``, the same rules as the per-turn path.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from matches.history import forget_turn_states
+from matches.models import Match, MatchParticipant, Order, Turn
+from matches.resolution import resolve_turn_with, turn_state_payload
+from units.models import Unit
+from world.caches import invalidate_match
+from world.models import Land, Province, Town
+from world.tiles import TileCache
+
+
+class MemoryMatchStore:
+    """``MatchStore`` over one participant's pending turns and the match's units,
+    provinces, lands and towns, with saves deferred to ``flush``."""
+
+    def __init__(self, match, participant, turns):
+        self.match = match
+        self.participant = participant
+        self.turns = turns
+        self._tile_cache = None
+        self._dirty = {}
+
+        turn_ids = [turn.id for turn in turns]
+        orders = list(
+            Order.objects.filter(
+                Q(turn_id__in=turn_ids)
+                | Q(participant=participant, payload__type="march", payload__status="active")
+            ).select_related("turn")
+        )
+        self._orders_by_turn = {order.turn_id: order for order in orders}
+        missing = [
+            Order(turn=turn, participant=participant, payload={"type": "pass"})
+            for turn in turns
+            if turn.status != Turn.STATUS_RESOLVED and turn.id not in self._orders_by_turn
+        ]
+        for order in Order.objects.bulk_create(missing):
+            self._orders_by_turn[order.turn_id] = order
+        self._turn_numbers = {turn.id: turn.number for turn in turns}
+        for order in orders:
+            self._turn_numbers.setdefault(order.turn_id, order.turn.number)
+
+        self.units = {
+            unit.id: unit
+            for unit in Unit.objects.filter(match=match).select_related("unit_type")
+        }
+        self.lands = {}
+        self.provinces = {}
+        self.towns = {}
+        self._load_world()
+
+    @classmethod
+    def load(cls, match, participant, first_number, last_number):
+        """Store for ``participant``'s turns ``first_number``..``last_number``, creating
+        missing Turn rows."""
+        existing = {
+            turn.number: turn
+            for turn in Turn.objects.filter(
+                match=match,
+                participant=participant,
+                number__range=(first_number, last_number),
+            ).defer("state")
+        }
+        created = Turn.objects.bulk_create(
+            [
+                Turn(match=match, participant=participant, number=number)
+                for number in range(first_number, last_number + 1)
+                if number not in existing
+            ]
+        )
+        turns = sorted([*existing.values(), *created], key=lambda turn: turn.number)
+        for turn in turns:
+            turn.match = match
+            turn.participant = participant
+        return cls(match, participant, turns)
+
+    def tile_cache(self):
+        if self._tile_cache is None:
+            self._tile_cache = TileCache(self.match)
+        return self._tile_cache
+
+    def order_for_turn(self, turn, participant):
+        return self._orders_by_turn[turn.id]
+
+    def active_marches(self, participant, turn):
+        marches = [
+            order
+            for order in self._orders_by_turn.values()
+            if order.participant_id == participant.id
+            and self._turn_numbers[order.turn_id] < turn.number
+            and (order.payload or {}).get("type") == "march"
+            and (order.payload or {}).get("status") == "active"
+        ]
+        marches.sort(key=lambda order: self._turn_numbers[order.turn_id])
+        return marches
+
+    def get_unit(self, unit_id):
+        try:
+            return self.units.get(int(unit_id))
+        except (TypeError, ValueError):
+            return None
+
+    def occupied_tiles(self, exclude_unit_id=None):
+        return {(unit.q, unit.r) for unit in self.units.values() if unit.id != exclude_unit_id}
+
+    def town_at(self, position):
+        self._refresh_world()
+        return self.towns.get(tuple(position))
+
+    def land_for_kingdom(self, kingdom_id):
+        self._refresh_world()
+        owned = [land for land in self.lands.values() if land.kingdom_id == kingdom_id]
+        if owned:
+            return min(owned, key=lambda land: land.id)
+        land = Land.objects.create(match=self.match, kingdom_id=kingdom_id)
+        self.lands[land.id] = land
+        return land
+
+    def turn_state(self, result):
+        self._refresh_world()
+        province_to_land = {}
+        land_ids = set()
+        for province in self.provinces.values():
+            province_to_land[str(province.id)] = province.land_id
+            if province.land_id is not None:
+                land_ids.add(province.land_id)
+        land_to_kingdom = {
+            str(land_id): self.lands[land_id].kingdom_id
+            for land_id in land_ids
+            if land_id in self.lands
+        }
+        units = [self.units[unit_id] for unit_id in sorted(self.units)]
+        return turn_state_payload(units, province_to_land, land_to_kingdom, result)
+
+    def save(self, instance, update_fields):
+        if "updated_at" in update_fields:
+            # bulk_update skips auto_now, which save() would have applied.
+            instance.updated_at = timezone.now()
+        instances, fields = self._dirty.setdefault(type(instance), ({}, set()))
+        instances[instance.pk] = instance
+        fields.update(update_fields)
+
+    def flush(self):
+        """Write every saved instance back, one ``bulk_update`` per model."""
+        for model, (instances, fields) in self._dirty.items():
+            model.objects.bulk_update(list(instances.values()), sorted(fields))
+        self._dirty = {}
+
+    def _load_world(self):
+        """Add lands, provinces and towns created since the last load.
+
+        Chunks generated lazily while resolving only ever add rows, so rows
+        already held, and any unsaved changes to them, are kept.
+        """
+        match = self.match
+        self._terrain_version = match.terrain_version
+        lands = Land.objects.filter(match=match, id__gt=max(self.lands, default=0))
+        self.lands.update((land.id, land) for land in lands)
+        loaded_province_id = max(self.provinces, default=0)
+        provinces = Province.objects.filter(match=match, id__gt=loaded_province_id).only(
+            "id", "land_id"
+        )
+        for province in provinces:
+            if province.land_id in self.lands:
+                province.land = self.lands[province.land_id]
+            self.provinces[province.id] = province
+        towns = Town.objects.filter(match=match, province_id__gt=loaded_province_id).only(
+            "id", "province_id", "q", "r"
+        )
+        for town in towns:
+            town.province = self.provinces[town.province_id]
+            self.towns[(town.q, town.r)] = town
+
+    def _refresh_world(self):
+        if self.match.terrain_version != self._terrain_version:
+            self._load_world()
+
+
+def resolve_turns(match_id, participant_id, max_turn):
+    """Resolve ``participant``'s turns up to ``max_turn`` in one transaction.
+
+    Returns ``[{"turn", "history_index", "result"}, ...]`` for the turns
+    resolved, matching what resolving them one by one would have produced.
+    """
+    try:
+        with transaction.atomic():
+            match = Match.objects.select_for_update().get(id=match_id)
+            participant = MatchParticipant.objects.select_for_update().get(
+                id=participant_id, match=match
+            )
+            if participant.last_resolved_turn >= max_turn:
+                return []
+            store = MemoryMatchStore.load(
+                match, participant, participant.last_resolved_turn + 1, max_turn
+            )
+            resolved = []
+            for turn in store.turns:
+                if turn.status == Turn.STATUS_RESOLVED:
+                    continue
+                result = resolve_turn_with(store, turn)
+                resolved.append(
+                    {
+                        "turn": turn.number,
+                        "history_index": turn.history_index,
+                        "result": result,
+                    }
+                )
+            store.flush()
+    except Exception:
+        # States remembered for turns that were rolled back must not be served,
+        # nor terrain cached for chunks generated inside the transaction.
+        forget_turn_states(match_id)
+        invalidate_match(match_id)
+        raise
+    return resolved
@@ -0,0 +1,181 @@
+"""Turn state history stored as periodic keyframes plus per-turn deltas.
+
+A keyframe is the full ``build_turn_state`` payload. Every other resolved turn
+stores only what changed since the previous history index: upserted and
+removed units, and set and removed ``province_to_land`` / ``land_to_kingdom``
+entries. Other keys (``generated_at``, ``result``) are stored as-is.
+"""
+
+from django.conf import settings
+
+from matches.models import Turn
+from world.caches import LRUCache
+
+# Reconstructed full states keyed by (match_id, history_index).
+_TURN_STATES = LRUCache(max_entries=64)
+
+MAPPING_KEYS = ("province_to_land", "land_to_kingdom")
+
+
+def is_keyframe_index(history_index, interval=None):
+    interval = interval or settings.TURN_KEYFRAME_INTERVAL
+    return interval <= 1 or (history_index - 1) % interval == 0
+
+
+def encode_turn_state(state, previous, history_index, interval=None):
+    """``(stored_state, is_keyframe)`` for ``state`` following ``previous``."""
+    if previous is None or is_keyframe_index(history_index, interval):
+        return state, True
+    return diff_turn_states(previous, state), False
+
+
+def diff_turn_states(previous, state):
+    delta = {
+        key: value
+        for key, value in state.items()
+        if key != "units" and key not in MAPPING_KEYS
+    }
+
+    previous_units = {unit["id"]: unit for unit in previous.get("units") or ()}
+    units = {unit["id"]: unit for unit in state.get("units") or ()}
+    delta["units"] = {
+        "upsert": [
+            unit for unit_id, unit in units.items() if previous_units.get(unit_id) != unit
+        ],
+        "remove": [unit_id for unit_id in previous_units if unit_id not in units],
+    }
+
+    for key in MAPPING_KEYS:
+        before = previous.get(key) or {}
+        after = state.get(key) or {}
+        delta[key] = {
+            "set": {
+                item: value
+                for item, value in after.items()
+                if item not in before or before[item] != value
+            },
+            "remove": [item for item in before if item not in after],
+        }
+    return delta
+
+
+def apply_turn_delta(state, delta):
+    """Full state after applying ``delta`` to ``state``; neither is modified."""
+    return _pack(_apply(_unpack(state), delta))
+
+
+def remember_turn_state(match_id, history_index, state):
+    _TURN_STATES.set((match_id, history_index), state)
+
+
+def forget_turn_states(match_id):
+    _TURN_STATES.invalidate(match_id)
+
+
+def full_turn_state(turn):
+    """Full state of a resolved ``turn``; safe on querysets that defer ``state``."""
+    if turn is None or turn.history_index is None:
+        return None
+    return turn_state_at(turn.match_id, turn.history_index)
+
+
+def turn_state_at(match_id, history_index):
+    """Full state at ``history_index``, or None if that turn is not resolved.
+
+    Starts from the nearest cached state or the latest keyframe at or before
+    ``history_index`` and applies the deltas after it, fetched in one query.
+    """
+    state = _TURN_STATES.get((match_id, history_index))
+    if state is not None:
+        return state
+
+    working = None
+    start = None
+    for index in range(history_index - 1, history_index - settings.TURN_KEYFRAME_INTERVAL, -1):
+        if index < 1:
+            break
+        cached = _TURN_STATES.get((match_id, index))
+        if cached is not None:
+            working = _unpack(cached)
+            start = index + 1
+            break
+    resolved = Turn.objects.filter(match_id=match_id, status=Turn.STATUS_RESOLVED)
+    if start is None:
+        start = (
+            resolved.filter(is_keyframe=True, history_index__lte=history_index)
+            .order_by("-history_index")
+            .values_list("history_index", flat=True)
+            .first()
+        )
+        if start is None:
+            return None
+
+    expected = start
+    rows = (
+        resolved.filter(history_index__range=(start, history_index))
+        .order_by("history_index")
+        .values_list("history_index", "is_keyframe", "state")
+    )
+    for index, keyframe, stored in rows:
+        if keyframe:
+            working = _unpack(stored or {})
+        elif working is None or index != expected:
+            # A delta must directly follow the state it was taken against.
+            return None
+        else:
+            _apply(working, stored)
+        expected = index + 1
+    if working is None or expected != history_index + 1:
+        return None
+
+    state = _pack(working)
+    remember_turn_state(match_id, history_index, state)
+    return state
+
+
+def _unpack(state):
+    working = {
+        key: value
+        for key, value in state.items()
+        if key != "units" and key not in MAPPING_KEYS
+    }
+    working["units"] = {unit["id"]: unit for unit in state.get("units") or ()}
+    for key in MAPPING_KEYS:
+        working[key] = dict(state.get(key) or {})
+    return working
+
+
+def _apply(working, delta):
+    for key, value in delta.items():
+        if key != "units" and key not in MAPPING_KEYS:
+            working[key] = value
+    for key in list(working):
+        if key != "units" and key not in MAPPING_KEYS and key not in delta:
+            del working[key]
+
+    units = working["units"]
+    unit_changes = delta.get("units") or {}
+    for unit_id in unit_changes.get("remove") or ():
+        units.pop(unit_id, None)
+    for unit in unit_changes.get("upsert") or ():
+        units[unit["id"]] = unit
+
+    for key in MAPPING_KEYS:
+        mapping = working[key]
+        changes = delta.get(key) or {}
+        for item in changes.get("remove") or ():
+            mapping.pop(item, None)
+        mapping.update(changes.get("set") or {})
+    return working
+
+
+def _pack(working):
+    state = {
+        key: value
+        for key, value in working.items()
+        if key != "units" and key not in MAPPING_KEYS
+    }
+    state["units"] = [working["units"][unit_id] for unit_id in sorted(working["units"])]
+    for key in MAPPING_KEYS:
+        state[key] = working[key]
+    return state
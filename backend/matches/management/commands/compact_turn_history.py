@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from matches.history import apply_turn_delta, encode_turn_state
+from matches.models import Match, Turn
+from world.caches import invalidate_match
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Rewrite resolved Turn.state history as keyframes plus per-turn deltas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--match", type=int, help="Only compact this match.")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=settings.TURN_KEYFRAME_INTERVAL,
+            help="Store a keyframe every this many history indices.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        if interval < 1:
+            raise CommandError("--interval must be at least 1.")
+
+        matches = Match.objects.order_by("id")
+        if options["match"] is not None:
+            matches = matches.filter(id=options["match"])
+            if not matches.exists():
+                raise CommandError(f"Match {options['match']} not found.")
+
+        for match_id in matches.values_list("id", flat=True):
+            with transaction.atomic():
+                rewritten, keyframes, total = self._compact(
+                    match_id, interval, options["dry_run"]
+                )
+            invalidate_match(match_id)
+            self.stdout.write(
+                f"Match {match_id}: {total} resolved turns, {keyframes} keyframes, "
+                f"{rewritten} rows rewritten."
+            )
+
+    def _compact(self, match_id, interval, dry_run):
+        turns = (
+            Turn.objects.filter(
+                match_id=match_id,
+                status=Turn.STATUS_RESOLVED,
+                history_index__isnull=False,
+            )
+            .order_by("history_index")
+            .only("id", "history_index", "is_keyframe", "state")
+        )
+        previous = None
+        previous_index = None
+        pending = []
+        rewritten = keyframes = total = 0
+        for turn in turns.iterator(chunk_size=BATCH_SIZE):
+            stored = turn.state or {}
+            if turn.is_keyframe:
+                state = stored
+            elif previous is not None and previous_index == turn.history_index - 1:
+                state = apply_turn_delta(previous, stored)
+            else:
+                raise CommandError(
+                    f"Match {match_id}: turn {turn.history_index} is a delta without a base."
+                )
+
+            base = previous if previous_index == turn.history_index - 1 else None
+            encoded, is_keyframe = encode_turn_state(state, base, turn.history_index, interval)
+            if encoded != stored or is_keyframe != turn.is_keyframe:
+                turn.state = encoded
+                turn.is_keyframe = is_keyframe
+                pending.append(turn)
+            if len(pending) >= BATCH_SIZE:
+                rewritten += self._flush(pending, dry_run)
+            keyframes += is_keyframe
+            total += 1
+            previous = state
+            previous_index = turn.history_index
+        rewritten += self._flush(pending, dry_run)
+        return rewritten, keyframes, total
+
+    def _flush(self, pending, dry_run):
+        count = len(pending)
+        if pending and not dry_run:
+            Turn.objects.bulk_update(pending, ["state", "is_keyframe"])
+        pending.clear()
+        return count
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("matches", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="match",
+            name="terrain_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("matches", "0002_match_terrain_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="match",
+            name="lazy_chunk_radius",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("matches", "0003_match_lazy_chunk_radius"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="turn",
+            name="is_keyframe",
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -20,6 +20,10 @@ class Match(models.Model):
     last_resolved_turn = models.PositiveIntegerField(default=0)
     max_turn_override = models.PositiveIntegerField(null=True, blank=True)
     world_seed = models.BigIntegerField(null=True, blank=True)
+    terrain_version = models.PositiveIntegerField(default=0)
+    # Chunks within this many chunks of the origin are generated on first
+    # touch; 0 turns lazy generation off.
+    lazy_chunk_radius = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -88,6 +92,9 @@ class Turn(models.Model):
     history_index = models.PositiveIntegerField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
     state = models.JSONField(default=dict, blank=True)
+    # False when ``state`` is a delta against the previous history index; read
+    # full states through ``matches.history.turn_state_at``.
+    is_keyframe = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
@@ -1,62 +1,166 @@
+from django.db import transaction
 from django.utils import timezone
 
-from matches.models import Order, Turn
+from matches.history import encode_turn_state, remember_turn_state, turn_state_at
+from matches.models import Match, MatchParticipant, Order, Turn
+from matches.services import get_occupied_tiles
 from units.models import Unit
-from world.pathfinding import find_path
-from world.terrain import movement_cost
+from world.caches import invalidate_match
+from world.regions import same_region
+from world.replanning import replan_path
 from world.tiles import TileCache
 from world.models import Land, Province, Town
 
 
+class MatchStore:
+    """Reads and writes made while resolving a turn, straight against the database.
+
+    ``matches.engine.MemoryMatchStore`` implements the same methods over state
+    loaded once, so a batch of turns runs through the exact same rules.
+    """
+
+    def __init__(self, match):
+        self.match = match
+
+    def tile_cache(self):
+        return TileCache(self.match)
+
+    def order_for_turn(self, turn, participant):
+        order = Order.objects.filter(turn=turn).first()
+        if not order:
+            order = Order.objects.create(
+                turn=turn,
+                participant=participant,
+                payload={"type": "pass"},
+            )
+        return order
+
+    def active_marches(self, participant, turn):
+        return list(
+            Order.objects.filter(
+                participant=participant,
+                turn__number__lt=turn.number,
+                payload__type="march",
+                payload__status="active",
+            ).order_by("turn__number")
+        )
+
+    def get_unit(self, unit_id):
+        return (
+            Unit.objects.filter(match=self.match, id=unit_id).select_related("unit_type").first()
+        )
+
+    def occupied_tiles(self, exclude_unit_id=None):
+        return get_occupied_tiles(self.match, exclude_unit_id=exclude_unit_id)
+
+    def town_at(self, position):
+        return (
+            Town.objects.select_related("province__land")
+            .filter(match=self.match, q=position[0], r=position[1])
+            .first()
+        )
+
+    def land_for_kingdom(self, kingdom_id):
+        land = Land.objects.filter(match=self.match, kingdom_id=kingdom_id).order_by("id").first()
+        if not land:
+            land = Land.objects.create(match=self.match, kingdom_id=kingdom_id)
+        return land
+
+    def turn_state(self, result):
+        return build_turn_state(self.match, result)
+
+    def save(self, instance, update_fields):
+        instance.save(update_fields=update_fields)
+
+
 def resolve_turn(turn):
-    match = turn.match
+    """Resolve ``turn`` with its match and participant rows locked.
+
+    ``matches.engine.resolve_turns`` takes the same locks in the same order,
+    so a batch and a single turn never assign the same history index or
+    overwrite each other's writes. A turn resolved while waiting for the lock
+    is not resolved again; its stored result is returned.
+    """
+    try:
+        with transaction.atomic():
+            match = Match.objects.select_for_update().get(id=turn.match_id)
+            participant = MatchParticipant.objects.select_for_update().get(
+                id=turn.participant_id
+            )
+            turn.refresh_from_db(fields=["status", "history_index", "resolved_at"])
+            if turn.status == Turn.STATUS_RESOLVED:
+                return (turn_state_at(match.id, turn.history_index) or {}).get("result")
+            turn.match = match
+            turn.participant = participant
+            return resolve_turn_with(MatchStore(match), turn)
+    except Exception:
+        # Drop turn states and terrain cached for work that was rolled back.
+        invalidate_match(turn.match_id)
+        raise
+
+
+def resolve_turn_with(store, turn):
+    match = store.match
     participant = turn.participant
     if participant is None:
         return {"status": "invalid", "reason": "no participant"}
-    order = Order.objects.filter(turn=turn).first()
-    if not order:
-        order = Order.objects.create(
-            turn=turn,
-            participant=participant,
-            payload={"type": "pass"},
-        )
-    elif order.participant_id != participant.id:
+    order = store.order_for_turn(turn, participant)
+    if order.participant_id != participant.id:
         order.participant = participant
-        order.save(update_fields=["participant"])
+        store.save(order, ["participant"])
 
     payload = order.payload or {}
     result = {"order_id": order.id, "actions": []}
 
-    if payload.get("type") == "move":
-        action_result = _resolve_move(match, payload)
+    order_type = payload.get("type")
+    if order_type in ("move", "march"):
+        _cancel_marches(store, participant, payload.get("unit_id"), turn)
+    if order_type == "move":
+        action_result = _resolve_move(store, payload)
+        result["actions"].append(action_result)
+    elif order_type == "march":
+        action_result = _resolve_march(store, order)
         result["actions"].append(action_result)
 
+    for march in store.active_marches(participant, turn):
+        result["actions"].append(_resolve_march(store, march))
+
     turn.status = Turn.STATUS_RESOLVED
     turn.resolved_at = timezone.now()
-    turn.state = build_turn_state(match, result)
     if turn.history_index is None:
         turn.history_index = match.last_resolved_turn + 1
-    turn.save(update_fields=["status", "resolved_at", "state", "history_index"])
+    state = store.turn_state(result)
+    previous = (
+        turn_state_at(match.id, turn.history_index - 1) if turn.history_index > 1 else None
+    )
+    turn.state, turn.is_keyframe = encode_turn_state(state, previous, turn.history_index)
+    store.save(turn, ["status", "resolved_at", "state", "is_keyframe", "history_index"])
+    remember_turn_state(match.id, turn.history_index, state)
 
     if participant.last_resolved_turn < turn.number:
         participant.last_resolved_turn = turn.number
-        participant.save(update_fields=["last_resolved_turn"])
+        store.save(participant, ["last_resolved_turn"])
     if match.last_resolved_turn < turn.history_index:
         match.last_resolved_turn = turn.history_index
-        match.save(update_fields=["last_resolved_turn"])
+        store.save(match, ["last_resolved_turn"])
 
     return result
 
 
 def build_turn_state(match, result=None):
-    if result is None:
-        result = {"status": "pending"}
     province_to_land, land_to_kingdom = _build_ownership_snapshot(match)
     units = (
         Unit.objects.filter(match=match)
         .select_related("unit_type", "owner_kingdom")
         .order_by("id")
     )
+    return turn_state_payload(units, province_to_land, land_to_kingdom, result)
+
+
+def turn_state_payload(units, province_to_land, land_to_kingdom, result=None):
+    """The ``Turn.state`` document for ``units`` (ordered by id) and the ownership maps."""
+    if result is None:
+        result = {"status": "pending"}
     unit_payload = [
         {
             "id": unit.id,
@@ -79,7 +183,7 @@ def build_turn_state(match, result=None):
     }
 
 
-def _resolve_move(match, payload):
+def _resolve_move(store, payload):
     unit_id = payload.get("unit_id")
     target = payload.get("to") or {}
     target_q = target.get("q")
@@ -88,60 +192,154 @@ def _resolve_move(match, payload):
     if unit_id is None or target_q is None or target_r is None:
         return {"status": "invalid", "reason": "missing unit_id or destination"}
 
-    unit = Unit.objects.filter(match=match, id=unit_id).select_related("unit_type").first()
+    unit = store.get_unit(unit_id)
     if not unit:
         return {"status": "invalid", "reason": "unit not found"}
 
     start = (unit.q, unit.r)
     goal = (int(target_q), int(target_r))
 
-    tile_cache = TileCache(match)
-    blocked = {(u.q, u.r) for u in Unit.objects.filter(match=match).exclude(id=unit.id)}
+    tile_cache = store.tile_cache()
+    if not same_region(tile_cache, start, goal):
+        return {"status": "blocked", "reason": "unreachable"}
+    blocked = store.occupied_tiles(exclude_unit_id=unit.id)
 
-    path = find_path(tile_cache, start, goal, blocked=blocked)
+    path = replan_path(tile_cache, unit.id, start, goal, blocked)
     if not path:
         return {"status": "blocked", "reason": "no path"}
 
-    move_points = unit.unit_type.move_points
-    spent = 0
-    new_pos = start
+    index, spent = _advance(tile_cache, path, blocked, unit.unit_type.move_points)
+    new_pos = path[index]
+    capture = _move_unit(store, unit, start, new_pos)
 
-    for step in path[1:]:
-        if step in blocked:
-            break
-        tile = tile_cache.get_tile(*step)
-        if tile is None:
-            break
-        step_cost = movement_cost(tile.get("terrain"))
-        if step_cost is None:
-            break
-        if spent + step_cost > move_points:
-            break
-        spent += step_cost
-        new_pos = step
+    return {
+        "status": "moved" if new_pos != start else "stayed",
+        "unit_id": unit.id,
+        "from": {"q": start[0], "r": start[1]},
+        "to": {"q": new_pos[0], "r": new_pos[1]},
+        "spent": spent,
+        "capture": capture,
+    }
+
+
+def _resolve_march(store, order):
+    payload = dict(order.payload)
+    unit_id = payload.get("unit_id")
+    target = payload.get("to") or {}
+    if unit_id is None or target.get("q") is None or target.get("r") is None:
+        return _finish_march(
+            store, order, payload, "invalid", {"reason": "missing unit_id or destination"}
+        )
 
-    capture = None
-    if new_pos != start:
-        unit.q, unit.r = new_pos
-        unit.save(update_fields=["q", "r", "updated_at"])
-        capture = _capture_town(match, unit, new_pos)
+    unit = store.get_unit(unit_id)
+    if not unit:
+        return _finish_march(store, order, payload, "invalid", {"reason": "unit not found"})
+
+    start = (unit.q, unit.r)
+    goal = (int(target["q"]), int(target["r"]))
+    if start == goal:
+        return _finish_march(store, order, payload, "arrived", {"unit_id": unit.id})
+
+    tile_cache = store.tile_cache()
+    if not same_region(tile_cache, start, goal):
+        return _finish_march(store, order, payload, "unreachable", {"unit_id": unit.id})
+    blocked = store.occupied_tiles(exclude_unit_id=unit.id)
+
+    route = [tuple(step) for step in payload.get("route") or ()]
+    if start in route:
+        route = route[route.index(start):]
+    else:
+        route = None
+    replanned = route is None or len(route) < 2 or route[1] in blocked
+    if replanned:
+        route = replan_path(tile_cache, unit.id, start, goal, blocked)
+        if not route:
+            payload["status"] = "active"
+            payload["route"] = []
+            order.payload = payload
+            store.save(order, ["payload"])
+            return {
+                "status": "blocked",
+                "reason": "no path",
+                "type": "march",
+                "order_id": order.id,
+                "unit_id": unit.id,
+            }
+
+    index, spent = _advance(tile_cache, route, blocked, unit.unit_type.move_points)
+    new_pos = route[index]
+    capture = _move_unit(store, unit, start, new_pos)
+
+    route = route[index:]
+    payload["status"] = "arrived" if new_pos == goal else "active"
+    payload["route"] = [list(step) for step in route]
+    order.payload = payload
+    store.save(order, ["payload"])
 
     return {
         "status": "moved" if new_pos != start else "stayed",
+        "type": "march",
+        "order_id": order.id,
         "unit_id": unit.id,
         "from": {"q": start[0], "r": start[1]},
         "to": {"q": new_pos[0], "r": new_pos[1]},
         "spent": spent,
         "capture": capture,
+        "replanned": replanned,
+        "remaining": len(route) - 1,
     }
 
 
-def _capture_town(match, unit, position):
-    town = (
-        Town.objects.select_related("province__land")
-        .filter(match=match, q=position[0], r=position[1])
-        .first()
-    )
+def _finish_march(store, order, payload, march_status, details):
+    payload["status"] = march_status
+    payload.pop("route", None)
+    order.payload = payload
+    store.save(order, ["payload"])
+    return {
+        "status": march_status,
+        "type": "march",
+        "order_id": order.id,
+        **details,
+    }
+
+
+def _cancel_marches(store, participant, unit_id, turn):
+    if unit_id is None:
+        return
+    for march in store.active_marches(participant, turn):
+        if march.payload.get("unit_id") != unit_id:
+            continue
+        march.payload = {**march.payload, "status": "cancelled"}
+        store.save(march, ["payload"])
+
+
+def _advance(tile_cache, path, blocked, move_points):
+    spent = 0
+    index = 0
+    for next_index in range(1, len(path)):
+        step = path[next_index]
+        if step in blocked:
+            break
+        step_cost = tile_cache.get_cost(*step)
+        if step_cost is None:
+            break
+        if spent + step_cost > move_points:
+            break
+        spent += step_cost
+        index = next_index
+    return index, spent
+
+
+def _move_unit(store, unit, start, new_pos):
+    if new_pos == start:
+        return None
+    unit.q, unit.r = new_pos
+    store.save(unit, ["q", "r", "updated_at"])
+    return _capture_town(store, unit, new_pos)
+
+
+def _capture_town(store, unit, position):
+    town = store.town_at(position)
     if not town:
         return None
 
@@ -150,16 +348,9 @@ def _capture_town(match, unit, position):
     if current_land and current_land.kingdom_id == unit.owner_kingdom_id:
         return {"status": "already_owned", "province_id": province.id}
 
-    land = (
-        Land.objects.filter(match=match, kingdom_id=unit.owner_kingdom_id)
-        .order_by("id")
-        .first()
-    )
-    if not land:
-        land = Land.objects.create(match=match, kingdom_id=unit.owner_kingdom_id)
-
+    land = store.land_for_kingdom(unit.owner_kingdom_id)
     province.land = land
-    province.save(update_fields=["land"])
+    store.save(province, ["land"])
 
     return {
         "status": "captured",
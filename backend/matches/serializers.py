@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from matches.models import Match
+from world.grid import DEFAULT_CHUNK_SIZE
 
 
 class DestinationSerializer(serializers.Serializer):
@@ -9,17 +10,17 @@ class DestinationSerializer(serializers.Serializer):
 
 
 class OrderPayloadSerializer(serializers.Serializer):
-    type = serializers.ChoiceField(choices=["move", "pass"])
+    type = serializers.ChoiceField(choices=["move", "march", "pass"])
     unit_id = serializers.IntegerField(required=False)
     to = DestinationSerializer(required=False)
 
     def validate(self, data):
-        if data.get("type") == "move":
+        if data.get("type") in ("move", "march"):
             errors = {}
             if data.get("unit_id") is None:
-                errors["unit_id"] = "This field is required for move orders."
+                errors["unit_id"] = f"This field is required for {data['type']} orders."
             if data.get("to") is None:
-                errors["to"] = "This field is required for move orders."
+                errors["to"] = f"This field is required for {data['type']} orders."
             if errors:
                 raise serializers.ValidationError(errors)
         return data
@@ -43,6 +44,26 @@ class ResolveUntilSerializer(serializers.Serializer):
     participant_id = serializers.IntegerField()
 
 
+class ViewportSerializer(serializers.Serializer):
+    MAX_CHUNKS = 64
+
+    from_q = serializers.IntegerField()
+    to_q = serializers.IntegerField()
+    from_r = serializers.IntegerField()
+    to_r = serializers.IntegerField()
+    turn = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if data["to_q"] < data["from_q"] or data["to_r"] < data["from_r"]:
+            raise serializers.ValidationError("to_q/to_r must not be below from_q/from_r.")
+        area = (data["to_q"] - data["from_q"] + 1) * (data["to_r"] - data["from_r"] + 1)
+        if area > self.MAX_CHUNKS:
+            raise serializers.ValidationError(
+                f"Viewport covers {area} chunks; at most {self.MAX_CHUNKS} are allowed."
+            )
+        return data
+
+
 class ParticipantInputSerializer(serializers.Serializer):
     user_id = serializers.IntegerField(required=False)
     username = serializers.CharField(required=False)
@@ -79,6 +100,9 @@ class CreateMatchSerializer(serializers.Serializer):
         default=100,
     )
     create_chunk = serializers.BooleanField(required=False, default=True)
+    lazy_chunk_radius = serializers.IntegerField(
+        required=False, default=0, min_value=0, max_value=1024
+    )
     chunk_q = serializers.IntegerField(required=False, default=0)
     chunk_r = serializers.IntegerField(required=False, default=0)
     chunk_size = serializers.IntegerField(required=False, default=32, min_value=1)
@@ -118,6 +142,22 @@ class CreateMatchSerializer(serializers.Serializer):
                 )
             data["participants"] = participants[:max_players]
             participants = data["participants"]
+        if data.get("lazy_chunk_radius"):
+            # Tiles are mapped to chunks by DEFAULT_CHUNK_SIZE, so lazily
+            # generated chunks of any other size could never be looked up.
+            if (
+                "chunk_size" in getattr(self, "initial_data", {})
+                and data.get("chunk_size") != DEFAULT_CHUNK_SIZE
+            ):
+                raise serializers.ValidationError(
+                    {
+                        "chunk_size": (
+                            f"chunk_size must be {DEFAULT_CHUNK_SIZE} when "
+                            "lazy_chunk_radius is set"
+                        )
+                    }
+                )
+            data["chunk_size"] = DEFAULT_CHUNK_SIZE
         if data.get("create_chunk", True):
             if data.get("province_min", 1) > data.get("province_max", 1):
                 raise serializers.ValidationError(
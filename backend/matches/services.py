@@ -1,6 +1,7 @@
 from django.utils import timezone
 
 from matches.models import Turn
+from units.models import Unit
 
 
 def get_max_turn(match, now=None, persist=False):
@@ -45,3 +46,10 @@ def ensure_turn(match, participant, turn_number):
         number=turn_number,
     )
     return turn
+
+
+def get_occupied_tiles(match, exclude_unit_id=None):
+    units = Unit.objects.filter(match=match)
+    if exclude_unit_id is not None:
+        units = units.exclude(id=exclude_unit_id)
+    return set(units.values_list("q", "r"))
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from matches.models import Match, MatchParticipant, Turn
+from world.generation import generate_missing_chunks
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.match = Match.objects.create(lazy_chunk_radius=1, world_seed=5)
+        generate_missing_chunks(self.match, [(0, 0)])
+        self.chunk_url = f"/api/matches/{self.match.id}/chunks/0/0/"
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_terrain_revalidates_with_not_modified(self):
+        url = f"{self.chunk_url}terrain/"
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+
+        revalidated = self.get(url, response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+        self.assertEqual(revalidated.content, b"")
+
+    def test_live_ownership_etag_changes_when_a_turn_resolves(self):
+        url = f"{self.chunk_url}ownership/"
+        etag = self.get(url)["ETag"]
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        Match.objects.filter(id=self.match.id).update(last_resolved_turn=1)
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_resolved_turn_state_is_not_modified(self):
+        user = get_user_model().objects.create(username="etag")
+        participant = MatchParticipant.objects.create(match=self.match, user=user, seat_order=1)
+        Turn.objects.create(
+            match=self.match,
+            participant=participant,
+            number=1,
+            history_index=1,
+            status=Turn.STATUS_RESOLVED,
+            resolved_at=timezone.now(),
+            state={"units": [], "result": {"actions": []}},
+        )
+        url = f"/api/matches/{self.match.id}/turns/1/state/"
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        revalidated = self.get(url, response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn("Last-Modified", revalidated)
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from matches.engine import resolve_turns
+from matches.history import turn_state_at
+from matches.models import Kingdom, Match, MatchParticipant, Order, Turn
+from matches.resolution import resolve_turn
+from units.models import Unit, UnitType
+from world.generation import generate_missing_chunks
+from world.pathfinding import hex_distance
+from world.regions import same_region
+from world.tiles import TileCache
+
+WORLD_SEED = 11
+TURNS = 5
+# Ids differ between the two matches; everything else must agree.
+UNSHARED_KEYS = ("order_id", "unit_id", "capture")
+
+
+class EngineEquivalenceTests(TestCase):
+    """``resolve_turns`` must leave the same history as resolving turn by turn."""
+
+    def setUp(self):
+        self.unit_type = UnitType.objects.create(name="engine-test", move_points=3)
+        self.per_turn = self.make_world()
+        tile_cache = TileCache(self.per_turn)
+        tiles = [
+            (cell["q"], cell["r"])
+            for cell in tile_cache.get_grid(0, 0).cells()
+            if tile_cache.get_cost(cell["q"], cell["r"]) is not None
+        ]
+        self.start = tiles[len(tiles) // 2]
+        self.goal = next(
+            tile
+            for tile in reversed(tiles)
+            if hex_distance(self.start, tile) >= 10
+            and same_region(tile_cache, self.start, tile)
+        )
+        self.batched = self.make_world()
+
+    def make_world(self):
+        match = Match.objects.create(lazy_chunk_radius=1, world_seed=WORLD_SEED)
+        generate_missing_chunks(match, [(0, 0)])
+        return match
+
+    def queue_turns(self, match):
+        user = get_user_model().objects.create(username=f"engine-{match.id}")
+        kingdom = Kingdom.objects.create(match=match)
+        participant = MatchParticipant.objects.create(
+            match=match, user=user, seat_order=1, kingdom=kingdom
+        )
+        unit = Unit.objects.create(
+            match=match,
+            owner_kingdom=kingdom,
+            unit_type=self.unit_type,
+            q=self.start[0],
+            r=self.start[1],
+        )
+        payloads = [
+            {"type": "march", "unit_id": unit.id, "to": {"q": self.goal[0], "r": self.goal[1]}},
+            {"type": "pass"},
+            {"type": "pass"},
+            {"type": "move", "unit_id": unit.id, "to": {"q": self.start[0], "r": self.start[1]}},
+            {"type": "pass"},
+        ]
+        for number, payload in enumerate(payloads, start=1):
+            turn = Turn.objects.create(match=match, participant=participant, number=number)
+            Order.objects.create(turn=turn, participant=participant, payload=payload)
+        return participant
+
+    def history(self, match):
+        history = []
+        for index in range(1, TURNS + 1):
+            state = turn_state_at(match.id, index)
+            units = [(unit["q"], unit["r"], unit["hp"], unit["status"]) for unit in state["units"]]
+            history.append((units, _comparable(state["result"])))
+        return history
+
+    def test_batch_matches_turn_by_turn_resolution(self):
+        self.queue_turns(self.per_turn)
+        single_results = [
+            resolve_turn(turn)
+            for turn in Turn.objects.filter(match=self.per_turn).order_by("number")
+        ]
+
+        participant = self.queue_turns(self.batched)
+        batch_results = resolve_turns(self.batched.id, participant.id, TURNS)
+
+        self.assertEqual([entry["turn"] for entry in batch_results], list(range(1, TURNS + 1)))
+        self.assertEqual(
+            [_comparable(entry["result"]) for entry in batch_results],
+            [_comparable(result) for result in single_results],
+        )
+        self.assertEqual(self.history(self.batched), self.history(self.per_turn))
+        moved = [action for result in single_results for action in result["actions"]]
+        self.assertTrue(any(action["status"] == "moved" for action in moved))
+
+
+def _comparable(result):
+    return [
+        {key: value for key, value in action.items() if key not in UNSHARED_KEYS}
+        for action in result["actions"]
+    ]
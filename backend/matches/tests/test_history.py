@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from matches.history import (
+    apply_turn_delta,
+    encode_turn_state,
+    forget_turn_states,
+    is_keyframe_index,
+    turn_state_at,
+)
+from matches.models import Match, MatchParticipant, Turn
+
+
+def make_state(step):
+    return {
+        "generated_at": f"t{step}",
+        "result": {"step": step},
+        "units": [
+            {"id": 1, "q": step, "r": 0},
+            *([{"id": 2, "q": 0, "r": step}] if step % 2 else []),
+        ],
+        "province_to_land": {"10": step % 3 or None, **({"11": 4} if step < 3 else {})},
+        "land_to_kingdom": {"4": step},
+    }
+
+
+class TurnDeltaTests(SimpleTestCase):
+    def test_keyframe_indexes_follow_the_interval(self):
+        self.assertEqual(
+            [index for index in range(1, 10) if is_keyframe_index(index, interval=4)],
+            [1, 5, 9],
+        )
+        self.assertTrue(is_keyframe_index(6, interval=1))
+
+    def test_delta_round_trips_between_states(self):
+        for step in range(1, 6):
+            previous, state = make_state(step - 1), make_state(step)
+            stored, keyframe = encode_turn_state(state, previous, history_index=2, interval=8)
+            self.assertFalse(keyframe)
+            self.assertEqual(apply_turn_delta(previous, stored), state)
+
+    def test_keyframe_stores_the_full_state(self):
+        state = make_state(3)
+        self.assertEqual(encode_turn_state(state, make_state(2), 9, interval=8), (state, True))
+        self.assertEqual(encode_turn_state(state, None, 4, interval=8), (state, True))
+
+
+@override_settings(TURN_KEYFRAME_INTERVAL=3)
+class TurnStateAtTests(TestCase):
+    def setUp(self):
+        self.match = Match.objects.create()
+        user = get_user_model().objects.create(username="historian")
+        participant = MatchParticipant.objects.create(match=self.match, user=user, seat_order=1)
+        previous = None
+        for index in range(1, 8):
+            state = make_state(index)
+            stored, keyframe = encode_turn_state(state, previous, index)
+            Turn.objects.create(
+                match=self.match,
+                participant=participant,
+                number=index,
+                history_index=index,
+                status=Turn.STATUS_RESOLVED,
+                state=stored,
+                is_keyframe=keyframe,
+            )
+            previous = state
+        forget_turn_states(self.match.id)
+
+    def test_states_are_rebuilt_from_keyframes_and_deltas(self):
+        self.assertEqual(
+            list(
+                Turn.objects.filter(match=self.match, is_keyframe=True).values_list(
+                    "history_index", flat=True
+                )
+            ),
+            [1, 4, 7],
+        )
+        for index in (6, 2, 7, 5):
+            self.assertEqual(turn_state_at(self.match.id, index), make_state(index))
+
+    def test_missing_delta_returns_none(self):
+        Turn.objects.filter(match=self.match, history_index=5).delete()
+        self.assertIsNone(turn_state_at(self.match.id, 6))
+        self.assertEqual(turn_state_at(self.match.id, 4), make_state(4))
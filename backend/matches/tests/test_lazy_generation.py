@@ -0,0 +1,26 @@
+from django.test import TestCase
+
+from matches.models import Match
+from world.generation import generate_missing_chunks
+from world.grid import DEFAULT_CHUNK_SIZE
+from world.models import Chunk
+from world.tiles import TileCache
+
+
+class LazyGenerationTests(TestCase):
+    def test_generated_chunks_are_addressable(self):
+        match = Match.objects.create(lazy_chunk_radius=2, world_seed=11)
+        self.assertEqual(generate_missing_chunks(match, [(0, 0), (1, 0)]), 2)
+        self.assertEqual(
+            set(Chunk.objects.filter(match=match).values_list("size", flat=True)),
+            {DEFAULT_CHUNK_SIZE},
+        )
+        tile_cache = TileCache(match)
+        for q, r in ((5, 5), (DEFAULT_CHUNK_SIZE + 5, 5)):
+            self.assertTrue(tile_cache.has_tile(q, r))
+
+    def test_match_with_32_tile_chunks_is_not_extended(self):
+        match = Match.objects.create(lazy_chunk_radius=2, world_seed=11)
+        Chunk.objects.create(match=match, chunk_q=0, chunk_r=0, size=32)
+        self.assertEqual(generate_missing_chunks(match, [(1, 0)]), 0)
+        self.assertFalse(Chunk.objects.filter(match=match, chunk_q=1).exists())
@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from matches.serializers import CreateMatchSerializer
+from world.grid import DEFAULT_CHUNK_SIZE
+
+
+class CreateMatchSerializerTests(SimpleTestCase):
+    def test_lazy_match_rejects_other_chunk_sizes(self):
+        serializer = CreateMatchSerializer(data={"lazy_chunk_radius": 4, "chunk_size": 32})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("chunk_size", serializer.errors)
+
+    def test_lazy_match_defaults_to_addressable_chunk_size(self):
+        serializer = CreateMatchSerializer(data={"lazy_chunk_radius": 4})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data["chunk_size"], DEFAULT_CHUNK_SIZE)
+
+    def test_eager_match_keeps_requested_chunk_size(self):
+        serializer = CreateMatchSerializer(data={"chunk_size": 32})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data["chunk_size"], 32)
@@ -1,51 +1,212 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
 from drf_spectacular.utils import OpenApiExample, extend_schema
 from rest_framework.decorators import api_view
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 
+from matches.engine import resolve_turns
+from matches.history import full_turn_state
 from matches.models import Kingdom, Match, MatchParticipant, Order, Turn
-from matches.resolution import build_turn_state, resolve_turn
+from matches.resolution import _advance, build_turn_state, resolve_turn
 from matches.serializers import (
     CreateMatchSerializer,
     MaxTurnOverrideSerializer,
     QueueOrdersSerializer,
     ResolveUntilSerializer,
     SubmitOrderSerializer,
+    ViewportSerializer,
 )
 from matches.services import (
     get_max_turn,
+    get_occupied_tiles,
     get_participant_max_turn,
     ensure_turn,
     get_participants,
 )
 from units.models import Unit, UnitType
-from world.pathfinding import find_path, hex_distance
-from world.terrain import movement_cost
-from world.tiles import TileCache
+from world.generation import generate_missing_chunks, lazy_chunk_allowed
+from world.pathfinding import cached_reachable_tiles, find_nearest_target
+from world.regions import same_region
+from world.tiles import TileCache, load_chunk_grid
 from world.models import Chunk, Land, Province, Town
 
 
-def _advance_along_path(tile_cache, path, start_index, move_points):
-    spent = 0
-    index = start_index
-    position = path[index]
-    for next_index in range(start_index + 1, len(path)):
-        tile = tile_cache.get_tile(*path[next_index])
-        if tile is None:
-            break
-        step_cost = movement_cost(tile.get("terrain"))
-        if step_cost is None or spent + step_cost > move_points:
-            break
-        spent += step_cost
-        index = next_index
-        position = path[next_index]
-    return index, position
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else 0
+
+
+def _with_validators(response, etag, last_modified=None, immutable=False):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(_timestamp(last_modified))
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _get_chunk(match_id, chunk_q, chunk_r):
+    chunks = Chunk.objects.select_related("match").defer("tiles", "tiles_blob")
+    chunk = chunks.filter(match_id=match_id, chunk_q=chunk_q, chunk_r=chunk_r).first()
+    if chunk is not None:
+        return chunk
+    match = get_object_or_404(Match, id=match_id)
+    if not lazy_chunk_allowed(match, chunk_q, chunk_r):
+        raise Http404("No Chunk matches the given query.")
+    generate_missing_chunks(match, [(chunk_q, chunk_r)])
+    return get_object_or_404(chunks, match_id=match_id, chunk_q=chunk_q, chunk_r=chunk_r)
+
+
+def _turn_from_params(request, match):
+    """Resolved turn named by ``?turn=``; returns ``(turn, error_response)``."""
+    turn_param = request.query_params.get("turn")
+    if turn_param is None:
+        return None, None
+    try:
+        turn_number = int(turn_param)
+    except ValueError:
+        return None, Response(
+            {"detail": "turn must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return _resolved_turn(match, turn_number), None
+
+
+def _ownership_version(match, turn):
+    # Ownership only changes when a turn resolves, so the match's resolved turn
+    # count versions the live overlay; a resolved turn's snapshot never changes.
+    if turn is not None:
+        return f"turn-{turn.id}-{_timestamp(turn.resolved_at)}"
+    return f"live-{match.last_resolved_turn}"
+
+
+def _map_changes(before, after):
+    changes = {key: value for key, value in after.items() if before.get(key) != value}
+    for key in before:
+        if key not in after:
+            changes[key] = None
+    return changes
+
+
+def _resolved_turn(match, turn_number):
+    turn = (
+        Turn.objects.filter(match=match, history_index=turn_number)
+        .defer("state")
+        .first()
+    )
+    if turn and turn.status == turn.STATUS_RESOLVED:
+        return turn
+    return None
+
+
+def _ownership_overlay(province_ids, turn=None):
+    """``(province_to_land, land_to_kingdom)`` for ``province_ids``.
+
+    Read from ``turn``'s snapshot when given, otherwise from the live rows.
+    """
+    province_to_land = {}
+    land_ids = set()
+    state = (full_turn_state(turn) or {}) if turn is not None else {}
+    snapshot_province_to_land = state.get("province_to_land")
+    snapshot_land_to_kingdom = state.get("land_to_kingdom")
+    if (
+        province_ids
+        and snapshot_province_to_land is not None
+        and snapshot_land_to_kingdom is not None
+    ):
+        for province_id in province_ids:
+            key = str(province_id)
+            if key in snapshot_province_to_land:
+                land_id = snapshot_province_to_land.get(key)
+                province_to_land[key] = land_id
+                if land_id is not None:
+                    land_ids.add(land_id)
+        land_to_kingdom = {
+            str(land_id): snapshot_land_to_kingdom.get(str(land_id))
+            for land_id in land_ids
+        }
+    else:
+        if province_ids:
+            for province in Province.objects.filter(id__in=province_ids).values(
+                "id", "land_id"
+            ):
+                province_to_land[str(province["id"])] = province["land_id"]
+                if province["land_id"] is not None:
+                    land_ids.add(province["land_id"])
+        land_to_kingdom = {}
+        if land_ids:
+            for land in Land.objects.filter(id__in=land_ids).values("id", "kingdom_id"):
+                land_to_kingdom[str(land["id"])] = land["kingdom_id"]
+    return province_to_land, land_to_kingdom
+
+
+def _town_overlay(match_id, province_ids, province_to_land, land_to_kingdom):
+    towns = []
+    if not province_ids:
+        return towns
+    for town in Town.objects.filter(
+        match_id=match_id, province_id__in=province_ids
+    ).values("province_id", "q", "r"):
+        province_id = town["province_id"]
+        land_id = province_to_land.get(str(province_id))
+        kingdom_id = (
+            land_to_kingdom.get(str(land_id)) if land_id is not None else None
+        )
+        towns.append(
+            {
+                "province_id": province_id,
+                "q": town["q"],
+                "r": town["r"],
+                "kingdom_id": kingdom_id,
+            }
+        )
+    return towns
+
+
+def _chunk_payload(chunk, grid, province_to_land, land_to_kingdom, towns):
+    return {
+        "match_id": chunk.match_id,
+        "chunk_q": chunk.chunk_q,
+        "chunk_r": chunk.chunk_r,
+        "size": chunk.size,
+        "tiles": {"cells": list(grid.cells())},
+        "meta": chunk.meta,
+        "province_to_land": province_to_land,
+        "land_to_kingdom": land_to_kingdom,
+        "towns": towns,
+    }
+
+
+def _unreachable_reason(match, tile_cache, payload):
+    if payload.get("type") not in ("move", "march"):
+        return None
+    unit = (
+        Unit.objects.filter(match=match, id=payload.get("unit_id"))
+        .values("q", "r")
+        .first()
+    )
+    if not unit:
+        return None
+    target = payload.get("to") or {}
+    goal = (target.get("q"), target.get("r"))
+    if not same_region(tile_cache, (unit["q"], unit["r"]), goal):
+        return "destination unreachable"
+    return None
 
 
 def _find_nearest_town_path(tile_cache, start, towns, province_owners, kingdom_id):
@@ -57,16 +218,11 @@ def _find_nearest_town_path(tile_cache, start, towns, province_owners, kingdom_i
         if province_owners.get(town["province_id"]) != kingdom_id
     ]
     candidates = preferred or towns
-    candidates = sorted(
-        candidates,
-        key=lambda town: hex_distance(start, (town["q"], town["r"])),
-    )
-    for town in candidates:
-        goal = (town["q"], town["r"])
-        path = find_path(tile_cache, start, goal)
-        if path:
-            return town, path
-    return None, None
+    targets = {(town["q"], town["r"]): town for town in candidates}
+    goal, path = find_nearest_target(tile_cache, start, targets)
+    if goal is None:
+        return None, None
+    return targets[goal], path
 
 
 @extend_schema(
@@ -232,7 +388,7 @@ def create_match(request):
                 kingdom_max=chunk_options["kingdom_max"],
                 no_kingdoms=True,
             )
-            match.refresh_from_db(fields=["world_seed"])
+            match.refresh_from_db(fields=["world_seed", "terrain_version"])
             Land.objects.filter(match=match).update(kingdom=None)
             chunk = Chunk.objects.filter(
                 match=match,
@@ -247,13 +403,13 @@ def create_match(request):
             if chunk and kingdom_ids:
                 province_ids = []
                 province_to_tiles = {}
-                for cell in chunk.tiles.get("cells", []):
-                    province_id = cell.get("province_id")
+                for cell in load_chunk_grid(chunk).cells():
+                    province_id = cell["province_id"]
                     if province_id is None:
                         continue
                     province_ids.append(province_id)
                     province_to_tiles.setdefault(province_id, []).append(
-                        (cell.get("q"), cell.get("r"))
+                        (cell["q"], cell["r"])
                     )
                 unique_provinces = list(dict.fromkeys(province_ids))
                 if len(unique_provinces) < len(kingdom_ids):
@@ -341,39 +497,40 @@ def create_match(request):
                                     participant.kingdom_id,
                                 )
                                 path_index = 0
+                                if not target:
+                                    break
 
-                            if target:
                                 destination = (target["q"], target["r"])
-                            else:
-                                destination = current_pos
-
-                            payload = {
-                                "type": "move",
-                                "unit_id": unit.id,
-                                "to": {"q": destination[0], "r": destination[1]},
-                            }
-                            turn = ensure_turn(match, participant, next_turn)
-                            Order.objects.update_or_create(
-                                turn=turn,
-                                defaults={
-                                    "participant": participant,
-                                    "payload": payload,
-                                },
+                                payload = {
+                                    "type": "march",
+                                    "unit_id": unit.id,
+                                    "to": {"q": destination[0], "r": destination[1]},
+                                    "route": [list(step) for step in path],
+                                }
+                                turn = ensure_turn(match, participant, next_turn)
+                                Order.objects.update_or_create(
+                                    turn=turn,
+                                    defaults={
+                                        "participant": participant,
+                                        "payload": payload,
+                                    },
+                                )
+
+                            advanced, _ = _advance(
+                                tile_cache,
+                                path[path_index:],
+                                set(),
+                                unit.unit_type.move_points,
                             )
-                            if path:
-                                path_index, current_pos = _advance_along_path(
-                                    tile_cache,
-                                    path,
-                                    path_index,
-                                    unit.unit_type.move_points,
+                            path_index += advanced
+                            current_pos = path[path_index]
+                            if current_pos == destination:
+                                province_owners[target["province_id"]] = (
+                                    participant.kingdom_id
                                 )
-                                if target and current_pos == destination:
-                                    province_owners[target["province_id"]] = (
-                                        participant.kingdom_id
-                                    )
-                                    target = None
-                                    path = None
-                                    path_index = 0
+                                target = None
+                                path = None
+                                path_index = 0
                             next_turn += 1
 
         chunk_payload = None
@@ -494,11 +651,16 @@ def queue_orders(request, match_id):
 
     queued = []
     skipped = []
+    tile_cache = TileCache(match)
 
     for payload in orders:
         if next_turn_number > max_turn:
             skipped.append({"order": payload, "reason": "beyond max_turn"})
             continue
+        reason = _unreachable_reason(match, tile_cache, payload)
+        if reason:
+            skipped.append({"order": payload, "reason": reason})
+            continue
 
         turn = ensure_turn(match, participant, next_turn_number)
         if turn.status == Turn.STATUS_RESOLVED:
@@ -537,33 +699,7 @@ def resolve_until_max(request, match_id):
     )
 
     max_turn = get_participant_max_turn(match, participant, now=timezone.now(), persist=True)
-    resolved = []
-
-    while participant.last_resolved_turn < max_turn:
-        turn_number = participant.last_resolved_turn + 1
-        turn = ensure_turn(match, participant, turn_number)
-        if turn.status == Turn.STATUS_RESOLVED:
-            participant.refresh_from_db(fields=["last_resolved_turn"])
-            continue
-        previous_turn = participant.last_resolved_turn
-        result = resolve_turn(turn)
-        participant.refresh_from_db(fields=["last_resolved_turn"])
-        resolved.append(
-            {
-                "turn": turn.number,
-                "history_index": turn.history_index,
-                "result": result,
-            }
-        )
-        if participant.last_resolved_turn == previous_turn:
-            return Response(
-                {
-                    "detail": "turn could not be resolved",
-                    "turn": turn.number,
-                    "result": result,
-                },
-                status=status.HTTP_409_CONFLICT,
-            )
+    resolved = resolve_turns(match.id, participant.id, max_turn)
 
     return Response(
         {
@@ -579,14 +715,15 @@ def resolve_until_max(request, match_id):
 @api_view(["GET"])
 def turn_state(request, match_id, turn_number):
     match = get_object_or_404(Match, id=match_id)
-    turn = Turn.objects.filter(match=match, history_index=turn_number).first()
+    turn = Turn.objects.filter(match=match, history_index=turn_number).defer("state").first()
     if not turn:
         latest = (
             Turn.objects.filter(match=match, status=Turn.STATUS_RESOLVED)
             .order_by("-history_index")
+            .defer("state")
             .first()
         )
-        state = latest.state if latest and latest.state else build_turn_state(match)
+        state = full_turn_state(latest) or build_turn_state(match)
         return Response(
             {
                 "match_id": match.id,
@@ -608,17 +745,25 @@ def turn_state(request, match_id, turn_number):
             }
         )
 
-    return Response(
+    etag = quote_etag(f"turn-{turn.id}-{_timestamp(turn.resolved_at)}")
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(turn.resolved_at)
+    )
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, turn.resolved_at, immutable=True)
+
+    response = Response(
         {
             "match_id": match.id,
             "turn": turn.history_index,
             "status": turn.status,
             "resolved_at": turn.resolved_at,
-            "state": turn.state or {},
+            "state": full_turn_state(turn) or {},
             "participant_id": turn.participant_id,
             "participant_turn": turn.number,
         }
     )
+    return _with_validators(response, etag, turn.resolved_at, immutable=True)
 
 
 @extend_schema(request=SubmitOrderSerializer)
@@ -642,6 +787,10 @@ def submit_order(request, match_id):
             status=status.HTTP_409_CONFLICT,
         )
 
+    reason = _unreachable_reason(match, TileCache(match), payload)
+    if reason:
+        return Response({"detail": reason}, status=status.HTTP_400_BAD_REQUEST)
+
     turn = ensure_turn(match, participant, next_turn_number)
     if turn.status == Turn.STATUS_RESOLVED:
         return Response(
@@ -668,91 +817,242 @@ def submit_order(request, match_id):
 
 
 @api_view(["GET"])
-def chunk_detail(request, match_id, chunk_q, chunk_r):
-    chunk = get_object_or_404(
-        Chunk, match_id=match_id, chunk_q=chunk_q, chunk_r=chunk_r
+def unit_reachable(request, match_id, unit_id):
+    match = get_object_or_404(Match, id=match_id)
+    unit = get_object_or_404(
+        Unit.objects.select_related("unit_type"), match=match, id=unit_id
     )
-    turn_param = request.query_params.get("turn")
-    snapshot_province_to_land = None
-    snapshot_land_to_kingdom = None
-    if turn_param is not None:
-        try:
-            turn_number = int(turn_param)
-        except ValueError:
-            return Response(
-                {"detail": "turn must be an integer"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        turn = Turn.objects.filter(match=chunk.match, history_index=turn_number).first()
-        if turn and turn.status == turn.STATUS_RESOLVED:
-            state = turn.state or {}
-            snapshot_province_to_land = state.get("province_to_land")
-            snapshot_land_to_kingdom = state.get("land_to_kingdom")
-
-    cells = chunk.tiles.get("cells", [])
-    province_ids = {
-        cell.get("province_id")
-        for cell in cells
-        if cell.get("province_id") is not None
-    }
-    province_to_land = {}
-    land_ids = set()
-    if (
-        province_ids
-        and snapshot_province_to_land is not None
-        and snapshot_land_to_kingdom is not None
-    ):
-        for province_id in province_ids:
-            key = str(province_id)
-            if key in snapshot_province_to_land:
-                land_id = snapshot_province_to_land.get(key)
-                province_to_land[key] = land_id
-                if land_id is not None:
-                    land_ids.add(land_id)
-        land_to_kingdom = {
-            str(land_id): snapshot_land_to_kingdom.get(str(land_id))
-            for land_id in land_ids
+    start = (unit.q, unit.r)
+    move_points = unit.unit_type.move_points
+    blocked = get_occupied_tiles(match, exclude_unit_id=unit.id)
+    costs = cached_reachable_tiles(TileCache(match), start, move_points, blocked)
+
+    tiles = []
+    for (q, r), cost in sorted(costs.items(), key=lambda item: item[1]):
+        tiles.extend((q, r, cost))
+    return Response(
+        {
+            "match_id": match.id,
+            "unit_id": unit.id,
+            "origin": {"q": start[0], "r": start[1]},
+            "move_points": move_points,
+            "fields": ["q", "r", "cost"],
+            "tiles": tiles,
         }
-    else:
-        if province_ids:
-            for province in Province.objects.filter(id__in=province_ids).values(
-                "id", "land_id"
-            ):
-                province_to_land[str(province["id"])] = province["land_id"]
-                if province["land_id"] is not None:
-                    land_ids.add(province["land_id"])
-        land_to_kingdom = {}
-        if land_ids:
-            for land in Land.objects.filter(id__in=land_ids).values("id", "kingdom_id"):
-                land_to_kingdom[str(land["id"])] = land["kingdom_id"]
-    towns = []
-    if province_ids:
+    )
+
+
+@api_view(["GET"])
+def chunk_detail(request, match_id, chunk_q, chunk_r):
+    chunk = _get_chunk(match_id, chunk_q, chunk_r)
+    turn, error = _turn_from_params(request, chunk.match)
+    if error is not None:
+        return error
+
+    # The chunk row versions its terrain (see chunk_terrain); generating other
+    # chunks moves terrain_version but leaves this payload unchanged.
+    etag = quote_etag(f"chunk-{chunk.id}-{_ownership_version(chunk.match, turn)}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag)
+
+    grid = TileCache(chunk.match).get_grid(chunk.chunk_q, chunk.chunk_r)
+    province_ids = grid.province_ids()
+    province_to_land, land_to_kingdom = _ownership_overlay(province_ids, turn)
+    towns = _town_overlay(chunk.match_id, province_ids, province_to_land, land_to_kingdom)
+    response = Response(
+        _chunk_payload(chunk, grid, province_to_land, land_to_kingdom, towns)
+    )
+    return _with_validators(response, etag)
+
+
+@api_view(["GET"])
+def chunk_terrain(request, match_id, chunk_q, chunk_r):
+    chunk = _get_chunk(match_id, chunk_q, chunk_r)
+    # Neither generate_world nor lazy generation rewrites an existing chunk, so
+    # a chunk's terrain is fixed for the lifetime of its row.
+    etag = quote_etag(f"terrain-{chunk.id}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, immutable=True)
+
+    grid = TileCache(chunk.match).get_grid(chunk.chunk_q, chunk.chunk_r)
+    towns = [
+        {"province_id": town["province_id"], "q": town["q"], "r": town["r"]}
         for town in Town.objects.filter(
-            match_id=chunk.match_id, province_id__in=province_ids
-        ).values("province_id", "q", "r"):
-            province_id = town["province_id"]
-            land_id = province_to_land.get(str(province_id))
-            kingdom_id = (
-                land_to_kingdom.get(str(land_id)) if land_id is not None else None
-            )
-            towns.append(
-                {
-                    "province_id": province_id,
-                    "q": town["q"],
-                    "r": town["r"],
-                    "kingdom_id": kingdom_id,
-                }
-            )
-    return Response(
+            match_id=chunk.match_id, province_id__in=grid.province_ids()
+        ).values("province_id", "q", "r")
+    ]
+    response = Response(
         {
             "match_id": chunk.match_id,
             "chunk_q": chunk.chunk_q,
             "chunk_r": chunk.chunk_r,
             "size": chunk.size,
-            "tiles": chunk.tiles,
+            "tiles": {"cells": list(grid.cells())},
             "meta": chunk.meta,
+            "towns": towns,
+        }
+    )
+    return _with_validators(response, etag, immutable=True)
+
+
+@api_view(["GET"])
+def chunk_ownership(request, match_id, chunk_q, chunk_r):
+    chunk = _get_chunk(match_id, chunk_q, chunk_r)
+    turn, error = _turn_from_params(request, chunk.match)
+    if error is not None:
+        return error
+
+    etag = quote_etag(f"ownership-{chunk.id}-{_ownership_version(chunk.match, turn)}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, immutable=turn is not None)
+
+    grid = TileCache(chunk.match).get_grid(chunk.chunk_q, chunk.chunk_r)
+    province_ids = grid.province_ids()
+    province_to_land, land_to_kingdom = _ownership_overlay(province_ids, turn)
+    towns = _town_overlay(chunk.match_id, province_ids, province_to_land, land_to_kingdom)
+    response = Response(
+        {
+            "match_id": chunk.match_id,
+            "chunk_q": chunk.chunk_q,
+            "chunk_r": chunk.chunk_r,
+            "turn": turn.history_index if turn is not None else None,
             "province_to_land": province_to_land,
             "land_to_kingdom": land_to_kingdom,
-            "towns": towns,
+            "towns": [
+                {"province_id": town["province_id"], "kingdom_id": town["kingdom_id"]}
+                for town in towns
+            ],
+        }
+    )
+    return _with_validators(response, etag, immutable=turn is not None)
+
+
+@api_view(["GET"])
+def ownership_changes(request, match_id):
+    match = get_object_or_404(Match, id=match_id)
+    try:
+        from_turn = int(request.query_params.get("from", ""))
+        to_turn = int(request.query_params.get("to", ""))
+    except ValueError:
+        return Response(
+            {"detail": "from and to must be integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    before = _resolved_turn(match, from_turn)
+    after = _resolved_turn(match, to_turn)
+    if before is None or after is None:
+        return Response(
+            {"detail": "from and to must be resolved turns"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    etag = quote_etag(
+        f"ownership-changes-{before.id}-{_timestamp(before.resolved_at)}"
+        f"-{after.id}-{_timestamp(after.resolved_at)}"
+    )
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, immutable=True)
+
+    before_state = full_turn_state(before) or {}
+    after_state = full_turn_state(after) or {}
+    response = Response(
+        {
+            "match_id": match.id,
+            "from": from_turn,
+            "to": to_turn,
+            "province_to_land": _map_changes(
+                before_state.get("province_to_land") or {},
+                after_state.get("province_to_land") or {},
+            ),
+            "land_to_kingdom": _map_changes(
+                before_state.get("land_to_kingdom") or {},
+                after_state.get("land_to_kingdom") or {},
+            ),
         }
     )
+    return _with_validators(response, etag, immutable=True)
+
+
+@extend_schema(parameters=[ViewportSerializer])
+@api_view(["GET"])
+def chunk_viewport(request, match_id):
+    match = get_object_or_404(Match, id=match_id)
+    serializer = ViewportSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    viewport = serializer.validated_data
+    turn = None
+    if viewport.get("turn") is not None:
+        turn = _resolved_turn(match, viewport["turn"])
+
+    viewport_chunks = (
+        Chunk.objects.filter(
+            match=match,
+            chunk_q__range=(viewport["from_q"], viewport["to_q"]),
+            chunk_r__range=(viewport["from_r"], viewport["to_r"]),
+        )
+        .defer("tiles", "tiles_blob")
+        .order_by("chunk_q", "chunk_r")
+    )
+    chunks = list(viewport_chunks)
+    if match.lazy_chunk_radius:
+        present = {(chunk.chunk_q, chunk.chunk_r) for chunk in chunks}
+        missing = [
+            (chunk_q, chunk_r)
+            for chunk_q in range(viewport["from_q"], viewport["to_q"] + 1)
+            for chunk_r in range(viewport["from_r"], viewport["to_r"] + 1)
+            if (chunk_q, chunk_r) not in present
+        ]
+        if missing:
+            generate_missing_chunks(match, missing)
+            chunks = list(viewport_chunks.all())
+    tile_cache = TileCache(match)
+    tile_cache.prefetch_chunks((chunk.chunk_q, chunk.chunk_r) for chunk in chunks)
+    grids = [tile_cache.get_grid(chunk.chunk_q, chunk.chunk_r) for chunk in chunks]
+    chunk_provinces = [grid.province_ids() for grid in grids]
+    all_provinces = set().union(*chunk_provinces)
+    province_to_land, land_to_kingdom = _ownership_overlay(all_provinces, turn)
+    towns_by_province = {}
+    for town in _town_overlay(match.id, all_provinces, province_to_land, land_to_kingdom):
+        towns_by_province.setdefault(town["province_id"], []).append(town)
+
+    def stream():
+        header = {
+            "match_id": match.id,
+            "turn": turn.history_index if turn is not None else None,
+            "from_q": viewport["from_q"],
+            "to_q": viewport["to_q"],
+            "from_r": viewport["from_r"],
+            "to_r": viewport["to_r"],
+        }
+        yield json.dumps(header)[:-1] + ', "chunks": ['
+        for position, (chunk, grid, province_ids) in enumerate(
+            zip(chunks, grids, chunk_provinces)
+        ):
+            chunk_province_to_land = {
+                str(province_id): province_to_land[str(province_id)]
+                for province_id in province_ids
+                if str(province_id) in province_to_land
+            }
+            chunk_land_to_kingdom = {
+                str(land_id): land_to_kingdom[str(land_id)]
+                for land_id in chunk_province_to_land.values()
+                if land_id is not None and str(land_id) in land_to_kingdom
+            }
+            towns = [
+                town
+                for province_id in sorted(province_ids)
+                for town in towns_by_province.get(province_id, ())
+            ]
+            payload = _chunk_payload(
+                chunk, grid, chunk_province_to_land, chunk_land_to_kingdom, towns
+            )
+            yield ("," if position else "") + json.dumps(payload, cls=DjangoJSONEncoder)
+        yield "]}"
+
+    response = StreamingHttpResponse(stream(), content_type="application/json")
+    patch_cache_control(response, no_cache=True)
+    return response
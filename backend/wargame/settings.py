@@ -96,6 +96,15 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 
+CHUNK_CACHE_MAX_BYTES = int(os.environ.get("CHUNK_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Second-tier chunk cache shared across processes: "redis", "memory" or empty to disable.
+CHUNK_STORE = os.environ.get("CHUNK_STORE", "")
+CHUNK_STORE_TTL = int(os.environ.get("CHUNK_STORE_TTL", str(24 * 60 * 60)))
+# Directory for memory-mapped per-match terrain snapshots; empty disables them.
+TERRAIN_SNAPSHOT_DIR = os.environ.get("TERRAIN_SNAPSHOT_DIR", "")
+# Turn.state stores a full keyframe every this many resolved turns and deltas between.
+TURN_KEYFRAME_INTERVAL = int(os.environ.get("TURN_KEYFRAME_INTERVAL", "32"))
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
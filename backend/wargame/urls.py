@@ -27,8 +27,28 @@ urlpatterns = [
         match_views.turn_state,
     ),
     path("api/matches/<int:match_id>/orders/", match_views.submit_order),
+    path(
+        "api/matches/<int:match_id>/units/<int:unit_id>/reachable/",
+        match_views.unit_reachable,
+    ),
+    path(
+        "api/matches/<int:match_id>/chunks/",
+        match_views.chunk_viewport,
+    ),
     path(
         "api/matches/<int:match_id>/chunks/<int:chunk_q>/<int:chunk_r>/",
         match_views.chunk_detail,
     ),
+    path(
+        "api/matches/<int:match_id>/chunks/<int:chunk_q>/<int:chunk_r>/terrain/",
+        match_views.chunk_terrain,
+    ),
+    path(
+        "api/matches/<int:match_id>/chunks/<int:chunk_q>/<int:chunk_r>/ownership/",
+        match_views.chunk_ownership,
+    ),
+    path(
+        "api/matches/<int:match_id>/ownership/changes/",
+        match_views.ownership_changes,
+    ),
 ]
@@ -0,0 +1,150 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from world.grid import GridCache
+from world.pathfinding import find_path
+from world.regions import RegionIndex, get_region_index
+from world.snapshots import TerrainBuffer, snapshot_layout, write_grids
+
+MIN_PARALLEL_REQUESTS = 8
+LABEL_ITEMSIZE = 8
+
+_WORKER_STATE = {}
+
+
+class TerrainSnapshot:
+    """Every chunk grid of a tile cache, and its region labels, packed into one
+    shared memory block.
+
+    ``layout`` lists ``(chunk_q, chunk_r, size, terrain_offset, province_offset)``
+    per chunk and ``label_layout`` lists ``(chunk_q, chunk_r, size, offset)``
+    per labelled chunk; they are all a worker needs to map the block back
+    into grids and a ``RegionIndex``.
+    """
+
+    def __init__(self, memory, layout, label_layout=(), open_labels=frozenset()):
+        self.memory = memory
+        self.layout = layout
+        self.label_layout = label_layout
+        self.open_labels = open_labels
+
+    @classmethod
+    def create(cls, tile_cache, region_index=None):
+        grids = tile_cache.all_grids()
+        layout, end = snapshot_layout(grids)
+        label_layout = []
+        label_arrays = []
+        open_labels = frozenset()
+        if region_index is not None:
+            open_labels = region_index.open_labels
+            for (chunk_q, chunk_r), size, labels in region_index.chunk_labels():
+                label_layout.append((chunk_q, chunk_r, size, end))
+                label_arrays.append(array("q", labels))
+                end += size * size * LABEL_ITEMSIZE
+        memory = shared_memory.SharedMemory(create=True, size=max(end, 1))
+        write_grids(memory.buf, grids, layout)
+        for (_, _, size, offset), labels in zip(label_layout, label_arrays):
+            memory.buf[offset:offset + size * size * LABEL_ITEMSIZE] = labels.tobytes()
+        return cls(memory, layout, label_layout, open_labels)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SnapshotTileCache(GridCache):
+    """Read-only tile cache whose grids are views into a ``TerrainBuffer``."""
+
+    def __init__(self, terrain, cache_key=None):
+        super().__init__()
+        self.terrain = terrain
+        self._cache_key = cache_key
+
+    def cache_key(self):
+        return self._cache_key
+
+    def chunk_keys(self):
+        return self.terrain.chunk_keys()
+
+    def _fetch_grid(self, chunk_q, chunk_r):
+        return self.terrain.grid(chunk_q, chunk_r)
+
+
+def find_paths_batch(tile_cache, requests, blocked=None, max_nodes=20000, workers=None):
+    """Solve ``(start, goal)`` requests against one terrain snapshot, in order.
+
+    ``blocked`` is shared by every request; a request's own start tile is
+    never treated as blocked. Large batches run in a process pool whose
+    workers map the terrain and its region labels from shared memory instead
+    of receiving copies. Each worker links its own portal graph lazily over
+    the mapped grids, covering only the chunks its requests cross.
+    """
+    requests = [(tuple(start), tuple(goal)) for start, goal in requests]
+    blocked = frozenset(blocked or ())
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(requests))
+    if workers <= 1 or len(requests) < MIN_PARALLEL_REQUESTS:
+        return [
+            _solve(tile_cache, start, goal, blocked, max_nodes) for start, goal in requests
+        ]
+
+    snapshot = TerrainSnapshot.create(tile_cache, get_region_index(tile_cache))
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                snapshot.name,
+                snapshot.layout,
+                snapshot.label_layout,
+                snapshot.open_labels,
+                tile_cache.cache_key(),
+                blocked,
+                max_nodes,
+            ),
+        ) as executor:
+            chunksize = max(1, len(requests) // (workers * 4))
+            return list(executor.map(_solve_in_worker, requests, chunksize=chunksize))
+    finally:
+        snapshot.close()
+
+
+def _init_worker(name, layout, label_layout, open_labels, cache_key, blocked, max_nodes):
+    memory = shared_memory.SharedMemory(name=name)
+    tile_cache = SnapshotTileCache(TerrainBuffer(memory.buf, layout, source=memory), cache_key)
+    tile_cache.region_index = _mapped_region_index(memory.buf, label_layout, open_labels)
+    _WORKER_STATE["tile_cache"] = tile_cache
+    _WORKER_STATE["blocked"] = blocked
+    _WORKER_STATE["max_nodes"] = max_nodes
+
+
+def _mapped_region_index(buffer, label_layout, open_labels):
+    chunks = {}
+    for chunk_q, chunk_r, size, offset in label_layout:
+        labels = buffer[offset:offset + size * size * LABEL_ITEMSIZE].cast("q")
+        chunks[(chunk_q, chunk_r)] = (chunk_q * size, chunk_r * size, size, labels)
+    return RegionIndex(chunks, open_labels)
+
+
+def _solve_in_worker(request):
+    start, goal = request
+    return _solve(
+        _WORKER_STATE["tile_cache"],
+        start,
+        goal,
+        _WORKER_STATE["blocked"],
+        _WORKER_STATE["max_nodes"],
+    )
+
+
+def _solve(tile_cache, start, goal, blocked, max_nodes):
+    if start in blocked:
+        blocked = blocked - {start}
+    return find_path(tile_cache, start, goal, blocked=blocked, max_nodes=max_nodes)
@@ -0,0 +1,249 @@
+"""Pathfinding benchmarks over synthetic worlds.
+
+Runs without Django or a database::
+
+    python -m world.benchmarks --chunks 4 --density 0.2
+
+and through ``manage.py benchmark_pathfinding`` with the same options.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from world.grid import DEFAULT_CHUNK_SIZE, ChunkGrid, GridCache
+from world.hierarchy import find_path_hierarchical, get_portal_graph
+from world.pathfinding import find_path, hex_distance, search_path
+from world.regions import get_region_index
+from world.terrain import TERRAIN_CODE_BY_NAME
+
+OPEN_TERRAIN = ("plains", "plains", "plains", "forest", "hills", "swamp")
+OBSTACLE_TERRAIN = ("water", "mountain")
+ISLAND_RADIUS = 3
+# Random draws allowed per tile or query before the world is judged too
+# obstructed to sample from.
+MAX_ATTEMPTS = 10000
+MODES = ("find_path", "flat", "hierarchical")
+SCENARIOS = ("short", "cross_chunk", "unreachable")
+
+
+class SyntheticTileCache(GridCache):
+    """In-memory world of ``chunks`` x ``chunks`` grids with random obstacles.
+
+    The last chunk contains a mountain ring whose centre is unreachable from
+    anywhere outside it.
+    """
+
+    def __init__(self, chunks=3, density=0.2, seed=1, size=DEFAULT_CHUNK_SIZE):
+        super().__init__()
+        self.chunks = chunks
+        self.size = size
+        rng = random.Random(seed)
+        self._source = {}
+        for chunk_q in range(chunks):
+            for chunk_r in range(chunks):
+                self._source[(chunk_q, chunk_r)] = _synthetic_grid(
+                    chunk_q, chunk_r, size, density, rng
+                )
+        last = chunks - 1
+        self.island = (last * size + size // 2, last * size + size // 2)
+        _carve_island(self._source[(last, last)], self.island)
+
+    def _fetch_grid(self, chunk_q, chunk_r):
+        return self._source.get((chunk_q, chunk_r))
+
+    def chunk_keys(self):
+        return sorted(self._source)
+
+
+def build_queries(tile_cache, count=10, seed=1, max_attempts=MAX_ATTEMPTS):
+    """Start/goal pairs per scenario.
+
+    Raises ``ValueError`` when ``max_attempts`` random draws do not yield a
+    passable tile or a connected pair, e.g. at very high obstacle density.
+    """
+    rng = random.Random(seed)
+    regions = get_region_index(tile_cache)
+    extent = tile_cache.chunks * tile_cache.size
+    far = tile_cache.size * (tile_cache.chunks - 1)
+
+    def passable_tile(low, high):
+        for _ in range(max_attempts):
+            tile = (rng.randrange(low, high), rng.randrange(low, high))
+            if tile_cache.get_cost(*tile) is None:
+                continue
+            if hex_distance(tile, tile_cache.island) > ISLAND_RADIUS:
+                return tile
+        raise ValueError(f"no passable tile found in {max_attempts} attempts")
+
+    def collect(scenario, draw):
+        found = queries[scenario]
+        for _ in range(max_attempts):
+            if len(found) >= count:
+                return
+            query = draw()
+            if query is not None:
+                found.append(query)
+        if len(found) < count:
+            raise ValueError(
+                f"only {len(found)} of {count} {scenario} queries found "
+                f"in {max_attempts} attempts"
+            )
+
+    def short_query():
+        start = passable_tile(0, extent)
+        goal = (start[0] + rng.randint(-8, 8), start[1] + rng.randint(-8, 8))
+        if start == goal or tile_cache.get_cost(*goal) is None:
+            return None
+        return (start, goal) if regions.same_region(start, goal) else None
+
+    def cross_chunk_query():
+        start = passable_tile(0, tile_cache.size)
+        goal = passable_tile(far, extent)
+        return (start, goal) if regions.same_region(start, goal) else None
+
+    queries = {scenario: [] for scenario in SCENARIOS}
+    collect("short", short_query)
+    if tile_cache.chunks > 1:
+        collect("cross_chunk", cross_chunk_query)
+    collect("unreachable", lambda: (passable_tile(0, extent), tile_cache.island))
+    return queries
+
+
+def run_query(tile_cache, mode, start, goal, max_nodes):
+    stats = {}
+    if mode == "flat":
+        path, _ = search_path(
+            tile_cache.get_cost, start, goal, set(), max_nodes, stats=stats
+        )
+    elif mode == "hierarchical":
+        path = find_path_hierarchical(tile_cache, start, goal, stats=stats)
+    else:
+        path = find_path(tile_cache, start, goal, max_nodes=max_nodes, stats=stats)
+    return path, stats.get("expanded", 0) + stats.get("abstract_expanded", 0)
+
+
+def run_benchmarks(
+    chunks=3,
+    density=0.2,
+    seed=1,
+    queries=10,
+    max_nodes=20000,
+    mode="find_path",
+    measure_memory=True,
+):
+    setup_started = time.perf_counter()
+    tile_cache = SyntheticTileCache(chunks=chunks, density=density, seed=seed)
+    query_sets = build_queries(tile_cache, count=queries, seed=seed)
+    if mode != "flat":
+        get_portal_graph(tile_cache).precompute(tile_cache, tile_cache.all_grids())
+    setup_seconds = time.perf_counter() - setup_started
+
+    rows = []
+    for scenario in SCENARIOS:
+        samples = []
+        for start, goal in query_sets[scenario]:
+            started = time.perf_counter()
+            path, expanded = run_query(tile_cache, mode, start, goal, max_nodes)
+            elapsed = time.perf_counter() - started
+            peak = 0
+            if measure_memory:
+                tracemalloc.start()
+                run_query(tile_cache, mode, start, goal, max_nodes)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            samples.append((path is not None, expanded, elapsed, peak))
+        if samples:
+            rows.append(_summarize(scenario, samples))
+    return {"setup_seconds": setup_seconds, "mode": mode, "rows": rows}
+
+
+def format_report(report):
+    lines = [
+        f"mode={report['mode']} setup={report['setup_seconds'] * 1000:.1f}ms",
+        f"{'scenario':<12} {'queries':>7} {'found':>5} {'nodes avg':>9} {'nodes max':>9} "
+        f"{'ms avg':>8} {'ms p95':>8} {'KiB avg':>8}",
+    ]
+    for row in report["rows"]:
+        lines.append(
+            f"{row['scenario']:<12} {row['queries']:>7} {row['found']:>5} "
+            f"{row['nodes_avg']:>9.0f} {row['nodes_max']:>9} "
+            f"{row['ms_avg']:>8.2f} {row['ms_p95']:>8.2f} {row['kib_avg']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--chunks", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--max-nodes", type=int, default=20000)
+    parser.add_argument("--mode", choices=MODES, default="find_path")
+    parser.add_argument("--no-memory", action="store_true")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pathfinding on synthetic worlds.")
+    add_arguments(parser)
+    options = parser.parse_args(argv)
+    try:
+        report = run_benchmarks(
+            chunks=options.chunks,
+            density=options.density,
+            seed=options.seed,
+            queries=options.queries,
+            max_nodes=options.max_nodes,
+            mode=options.mode,
+            measure_memory=not options.no_memory,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(format_report(report))
+
+
+def _synthetic_grid(chunk_q, chunk_r, size, density, rng):
+    grid = ChunkGrid.empty(chunk_q, chunk_r, size)
+    open_codes = [TERRAIN_CODE_BY_NAME[name] for name in OPEN_TERRAIN]
+    obstacle_codes = [TERRAIN_CODE_BY_NAME[name] for name in OBSTACLE_TERRAIN]
+    for index in range(size * size):
+        if rng.random() < density:
+            grid.terrain[index] = rng.choice(obstacle_codes)
+        else:
+            grid.terrain[index] = rng.choice(open_codes)
+        grid.provinces[index] = 1 + index // 64
+    return grid
+
+
+def _carve_island(grid, center):
+    mountain = TERRAIN_CODE_BY_NAME["mountain"]
+    plains = TERRAIN_CODE_BY_NAME["plains"]
+    for dq in range(-ISLAND_RADIUS - 1, ISLAND_RADIUS + 2):
+        for dr in range(-ISLAND_RADIUS - 1, ISLAND_RADIUS + 2):
+            tile = (center[0] + dq, center[1] + dr)
+            distance = hex_distance(center, tile)
+            index = grid.index(*tile)
+            if index < 0 or distance > ISLAND_RADIUS:
+                continue
+            grid.terrain[index] = mountain if distance == ISLAND_RADIUS else plains
+
+
+def _summarize(scenario, samples):
+    timings = sorted(sample[2] for sample in samples)
+    nodes = [sample[1] for sample in samples]
+    p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+    return {
+        "scenario": scenario,
+        "queries": len(samples),
+        "found": sum(1 for sample in samples if sample[0]),
+        "nodes_avg": sum(nodes) / len(nodes),
+        "nodes_max": max(nodes),
+        "ms_avg": 1000 * sum(timings) / len(timings),
+        "ms_p95": 1000 * timings[p95_index],
+        "kib_avg": sum(sample[3] for sample in samples) / len(samples) / 1024,
+    }
+
+
+if __name__ == "__main__":
+    main()
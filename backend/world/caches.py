@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+_REGISTRY = []
+
+
+class VersionedCache:
+    """Small LRU of per-match values that are dropped when the version moves on."""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class LRUCache:
+    """Bounded LRU whose keys start with the match id, with hit/miss counters.
+
+    With ``max_bytes`` and a ``sizeof`` callable the cache is also bounded by
+    the summed size of its values.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = value
+            if self.sizeof is not None:
+                size = self.sizeof(value)
+                self._sizes[key] = size
+                self.resident_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None
+                and self.resident_bytes > self.max_bytes
+                and len(self._entries) > 1
+            ):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate(self, match_id=None):
+        with self._lock:
+            if match_id is None:
+                self._entries.clear()
+                self._sizes.clear()
+                self.resident_bytes = 0
+                return
+            for key in [key for key in self._entries if key[0] == match_id]:
+                self._discard(key)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "resident_bytes": self.resident_bytes,
+        }
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.resident_bytes -= self._sizes.pop(key, 0)
+
+
+def invalidate_match(match_id):
+    for cache in _REGISTRY:
+        cache.invalidate(match_id)
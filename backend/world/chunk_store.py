@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+class MemoryChunkStore:
+    """In-process stand-in for ``RedisChunkStore`` used by tests and local runs."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: self._entries[key] for key in keys if key in self._entries}
+
+    def set_many(self, values):
+        with self._lock:
+            for key, data in values.items():
+                self._entries[key] = data
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisChunkStore:
+    """Packed chunk grids in Redis, shared by every web and worker process.
+
+    Keys embed the terrain version, so regenerated terrain is never served
+    stale; old versions simply expire after ``ttl`` seconds. ``TileCache``
+    only writes entries once the transaction that read them has committed,
+    since a rolled-back version number is reused. Redis errors are
+    treated as misses so a Redis outage only costs the Postgres round trip.
+    """
+
+    def __init__(self, url, ttl):
+        import redis
+
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self._client.mget(keys)
+        except self._errors:
+            return {}
+        return {key: data for key, data in zip(keys, values) if data is not None}
+
+    def set_many(self, values):
+        if not values:
+            return
+        try:
+            pipeline = self._client.pipeline(transaction=False)
+            for key, data in values.items():
+                pipeline.set(key, data, ex=self.ttl)
+            pipeline.execute()
+        except self._errors:
+            pass
+
+
+def chunk_store_key(match_id, terrain_version, chunk_q, chunk_r):
+    return f"wargame:chunk:{match_id}:{terrain_version}:{chunk_q}:{chunk_r}"
+
+
+def get_chunk_store():
+    """The configured second-tier chunk store, or None when ``CHUNK_STORE`` is unset."""
+    global _STORE
+    backend = settings.CHUNK_STORE
+    if not backend:
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if backend == "redis":
+                    _STORE = RedisChunkStore(settings.REDIS_URL, settings.CHUNK_STORE_TTL)
+                elif backend == "memory":
+                    _STORE = MemoryChunkStore()
+                else:
+                    raise ValueError(f"unknown CHUNK_STORE {backend!r}")
+    return _STORE
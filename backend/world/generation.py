@@ -0,0 +1,168 @@
+"""Persisting chunk layouts, shared by ``generate_world`` and lazy generation.
+
+Layouts (``world.layout``) are pure functions of their job, so a chunk
+generated on demand from ``Match.world_seed`` is identical to one built ahead
+of time by the command.
+"""
+
+import random
+import time
+from array import array
+
+from django.db import transaction
+from django.db.models import F
+
+from matches.models import Kingdom, Match
+from world.caches import invalidate_match
+from world.grid import DEFAULT_CHUNK_SIZE, ChunkGrid
+from world.layout import chunk_seed, layout_job
+from world.models import Chunk, Land, Province, Town
+
+TIMING_PHASES = ("layout", "persist", "encode")
+
+# Options used for chunks generated on demand; kingdoms are left unassigned so
+# explored land starts neutral. Chunks are always DEFAULT_CHUNK_SIZE tiles.
+LAZY_CHUNK_OPTIONS = {
+    "province_min": 8,
+    "province_max": 24,
+    "land_min": 8,
+    "land_max": 24,
+    "kingdom_min": 1,
+    "kingdom_max": 4,
+    "no_kingdoms": True,
+}
+
+
+def persist_layout(match, layout, seed, timings=None):
+    """Create the kingdoms, lands, provinces, towns and chunk row for ``layout``."""
+    if timings is None:
+        timings = dict.fromkeys(TIMING_PHASES, 0.0)
+    started = time.perf_counter()
+    kingdoms = Kingdom.objects.bulk_create(
+        [Kingdom(match=match) for _ in range(layout.kingdom_count)]
+    )
+    lands = Land.objects.bulk_create(
+        [
+            Land(
+                match=match,
+                kingdom=kingdoms[layout.land_kingdoms[land_index]] if kingdoms else None,
+            )
+            for land_index in range(layout.land_count)
+        ]
+    )
+    provinces = Province.objects.bulk_create(
+        [Province(match=match, land=lands[land_index]) for land_index in layout.province_lands]
+    )
+    Town.objects.bulk_create(
+        [
+            Town(match=match, province=province, q=q, r=r)
+            for province, (q, r) in zip(provinces, layout.towns)
+        ]
+    )
+    timings["persist"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    grid = ChunkGrid.empty(layout.chunk_q, layout.chunk_r, layout.size)
+    grid.terrain[:] = array("B", layout.terrain)
+    for province, tiles in zip(provinces, layout.provinces):
+        for q, r in tiles:
+            grid.provinces[grid.index(q, r)] = province.id
+    tiles_blob = grid.to_bytes()
+    timings["encode"] += time.perf_counter() - started
+
+    meta = {
+        "seed": seed,
+        "province_count": len(provinces),
+        "land_count": len(lands),
+        "kingdom_count": len(kingdoms),
+    }
+
+    started = time.perf_counter()
+    chunk = Chunk.objects.create(
+        match=match,
+        chunk_q=layout.chunk_q,
+        chunk_r=layout.chunk_r,
+        size=layout.size,
+        tiles_blob=tiles_blob,
+        meta=meta,
+    )
+    timings["persist"] += time.perf_counter() - started
+    return chunk
+
+
+def lazy_chunk_allowed(match, chunk_q, chunk_r):
+    """Whether ``match`` generates chunk ``(chunk_q, chunk_r)`` on first touch."""
+    radius = match.lazy_chunk_radius
+    return bool(radius) and max(abs(chunk_q), abs(chunk_r)) < radius
+
+
+def generate_missing_chunks(match, keys):
+    """Generate the chunks in ``keys`` that lazy generation covers and that do not exist yet.
+
+    The match row is locked while generating, so concurrent requests touching
+    the same chunk wait for the first one and then find it already persisted.
+    Returns the number of chunks generated. Whenever a covered chunk is
+    requested ``match.terrain_version`` and ``match.world_seed`` are refreshed,
+    since another process may have generated it first.
+    """
+    keys = [key for key in dict.fromkeys(keys) if lazy_chunk_allowed(match, *key)]
+    if not keys:
+        return 0
+
+    generated = 0
+    if _missing_chunks(match.id, keys):
+        generated = _generate_locked(match.id, keys)
+        if generated:
+            invalidate_match(match.id)
+    match.refresh_from_db(fields=["world_seed", "terrain_version"])
+    return generated
+
+
+def _generate_locked(match_id, keys):
+    generated = 0
+    with transaction.atomic():
+        locked = Match.objects.select_for_update().get(id=match_id)
+        if locked.world_seed is None:
+            locked.world_seed = random.SystemRandom().randrange(1, 2**63)
+            locked.save(update_fields=["world_seed"])
+        if Chunk.objects.filter(match_id=locked.id).exclude(size=DEFAULT_CHUNK_SIZE).exists():
+            # Tiles map to chunks by DEFAULT_CHUNK_SIZE; chunks laid out at
+            # another size could never be looked up, so none are added.
+            return 0
+        options = LAZY_CHUNK_OPTIONS
+        for chunk_q, chunk_r in _missing_chunks(locked.id, keys):
+            seed = chunk_seed(locked.world_seed, chunk_q, chunk_r)
+            layout = layout_job(
+                (
+                    chunk_q,
+                    chunk_r,
+                    DEFAULT_CHUNK_SIZE,
+                    seed,
+                    locked.world_seed,
+                    options["province_min"],
+                    options["province_max"],
+                    options["land_min"],
+                    options["land_max"],
+                    options["kingdom_min"],
+                    options["kingdom_max"],
+                    options["no_kingdoms"],
+                )
+            )
+            persist_layout(locked, layout, seed)
+            generated += 1
+        if generated:
+            Match.objects.filter(id=locked.id).update(terrain_version=F("terrain_version") + 1)
+    return generated
+
+
+def _missing_chunks(match_id, keys):
+    qs = [key[0] for key in keys]
+    rs = [key[1] for key in keys]
+    existing = set(
+        Chunk.objects.filter(
+            match_id=match_id,
+            chunk_q__range=(min(qs), max(qs)),
+            chunk_r__range=(min(rs), max(rs)),
+        ).values_list("chunk_q", "chunk_r")
+    )
+    return [key for key in keys if key not in existing]
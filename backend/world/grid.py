@@ -0,0 +1,310 @@
+import struct
+import sys
+import zlib
+from array import array
+from functools import lru_cache
+
+from world.terrain import TERRAIN_CODE_COSTS, TERRAIN_CODES, terrain_code
+
+DEFAULT_CHUNK_SIZE = 64
+PREFETCH_MARGIN = 16
+PREFETCH_MAX_CHUNKS = 256
+
+NO_PROVINCE = 0
+
+# Packed chunk layout: header, then terrain codes (one byte per tile) followed
+# by province ids stored as uint32 offsets from ``province_base`` (0 for none),
+# or as raw int64 ids when FLAG_WIDE_PROVINCES is set. FLAG_ZLIB compresses
+# everything after the header.
+CHUNK_MAGIC = b"WGC1"
+CHUNK_HEADER = struct.Struct("<4sHBxq")
+FLAG_ZLIB = 1
+FLAG_WIDE_PROVINCES = 2
+MAX_PROVINCE_OFFSET = 0xFFFFFFFF
+
+NEIGHBOR_OFFSETS = (
+    (1, 0),
+    (1, -1),
+    (0, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, 1),
+)
+
+
+def chunk_coords_for(q, r):
+    return q // DEFAULT_CHUNK_SIZE, r // DEFAULT_CHUNK_SIZE
+
+
+@lru_cache(maxsize=8)
+def neighbor_table(size):
+    table = []
+    for index in range(size * size):
+        dq, dr = divmod(index, size)
+        table.append(
+            tuple(
+                (dq + oq) * size + dr + orr
+                for oq, orr in NEIGHBOR_OFFSETS
+                if 0 <= dq + oq < size and 0 <= dr + orr < size
+            )
+        )
+    return table
+
+
+class ChunkGrid:
+    """Flat per-chunk arrays indexed by ``(q - base_q) * size + (r - base_r)``.
+
+    ``terrain`` holds terrain codes (0 for a missing tile) and ``provinces``
+    holds province ids (0 for none).
+    """
+
+    __slots__ = ("chunk_q", "chunk_r", "size", "base_q", "base_r", "terrain", "provinces")
+
+    def __init__(self, chunk_q, chunk_r, size, terrain, provinces):
+        self.chunk_q = chunk_q
+        self.chunk_r = chunk_r
+        self.size = size
+        self.base_q = chunk_q * size
+        self.base_r = chunk_r * size
+        self.terrain = terrain
+        self.provinces = provinces
+
+    @classmethod
+    def empty(cls, chunk_q, chunk_r, size):
+        area = size * size
+        return cls(chunk_q, chunk_r, size, array("B", bytes(area)), array("q", bytes(8 * area)))
+
+    @classmethod
+    def from_cells(cls, chunk_q, chunk_r, size, cells):
+        grid = cls.empty(chunk_q, chunk_r, size)
+        for cell in cells:
+            index = grid.index(cell["q"], cell["r"])
+            if index < 0:
+                continue
+            grid.terrain[index] = terrain_code(cell.get("terrain"))
+            grid.provinces[index] = cell.get("province_id") or NO_PROVINCE
+        return grid
+
+    @classmethod
+    def from_bytes(cls, chunk_q, chunk_r, data):
+        data = bytes(data)
+        magic, size, flags, province_base = CHUNK_HEADER.unpack_from(data)
+        if magic != CHUNK_MAGIC:
+            raise ValueError("not a packed chunk")
+        body = data[CHUNK_HEADER.size:]
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        area = size * size
+        terrain = array("B", body[:area])
+        if flags & FLAG_WIDE_PROVINCES:
+            provinces = _unpack_array("q", body[area:])
+        else:
+            offsets = _unpack_array("I", body[area:])
+            provinces = array(
+                "q", (province_base + offset if offset else NO_PROVINCE for offset in offsets)
+            )
+        if len(terrain) != area or len(provinces) != area:
+            raise ValueError("packed chunk is truncated")
+        return cls(chunk_q, chunk_r, size, terrain, provinces)
+
+    def to_bytes(self, compress=True):
+        flags = FLAG_ZLIB if compress else 0
+        province_ids = self.province_ids()
+        province_base = min(province_ids) - 1 if province_ids else 0
+        if province_ids and max(province_ids) - province_base > MAX_PROVINCE_OFFSET:
+            flags |= FLAG_WIDE_PROVINCES
+            province_base = 0
+            provinces = array("q", self.provinces)
+        else:
+            provinces = array(
+                "I",
+                (
+                    province_id - province_base if province_id else 0
+                    for province_id in self.provinces
+                ),
+            )
+        if sys.byteorder != "little":
+            provinces.byteswap()
+        body = bytes(self.terrain) + provinces.tobytes()
+        if compress:
+            body = zlib.compress(body)
+        return CHUNK_HEADER.pack(CHUNK_MAGIC, self.size, flags, province_base) + body
+
+    def index(self, q, r):
+        dq = q - self.base_q
+        dr = r - self.base_r
+        size = self.size
+        if 0 <= dq < size and 0 <= dr < size:
+            return dq * size + dr
+        return -1
+
+    def contains(self, q, r):
+        index = self.index(q, r)
+        return index >= 0 and self.terrain[index] != 0
+
+    def cost_at(self, q, r):
+        index = self.index(q, r)
+        if index < 0:
+            return None
+        return TERRAIN_CODE_COSTS[self.terrain[index]]
+
+    def province_at(self, q, r):
+        index = self.index(q, r)
+        if index < 0:
+            return None
+        return self.provinces[index] or None
+
+    def tile_at(self, q, r):
+        index = self.index(q, r)
+        if index < 0 or not self.terrain[index]:
+            return None
+        return self._cell(index)
+
+    def cells(self):
+        for index, code in enumerate(self.terrain):
+            if code:
+                yield self._cell(index)
+
+    def province_ids(self):
+        return {province_id for province_id in self.provinces if province_id}
+
+    @property
+    def nbytes(self):
+        return (
+            len(self.terrain) * self.terrain.itemsize
+            + len(self.provinces) * self.provinces.itemsize
+        )
+
+    def _cell(self, index):
+        dq, dr = divmod(index, self.size)
+        return {
+            "q": self.base_q + dq,
+            "r": self.base_r + dr,
+            "province_id": self.provinces[index] or None,
+            "terrain": TERRAIN_CODES[self.terrain[index]],
+        }
+
+
+class GridCache:
+    """Tile lookups over per-chunk grids; subclasses supply ``_fetch_grid``."""
+
+    def __init__(self):
+        self._grids = {}
+        self._absent = set()
+        self.region_index = None
+        self.portal_graph = None
+
+    def _fetch_grid(self, chunk_q, chunk_r):
+        raise NotImplementedError
+
+    def chunk_keys(self):
+        raise NotImplementedError
+
+    def cache_key(self):
+        return None
+
+    def may_generate(self, chunk_q, chunk_r):
+        """Whether a chunk that does not exist yet is created on first fetch."""
+        return False
+
+    def _fetch_grids(self, keys, generate=True):
+        """Grids for ``keys``; with ``generate=False`` keys that would only exist
+        once generated may be left out, so they are fetched again on demand."""
+        return {key: self._fetch_grid(*key) for key in keys}
+
+    def prefetch_chunks(self, keys, generate=False):
+        missing = [key for key in dict.fromkeys(keys) if key not in self._grids]
+        if missing:
+            self._grids.update(self._fetch_grids(missing, generate=generate))
+
+    def prefetch_bounds(self, min_q, min_r, max_q, max_r, generate=False):
+        """Load every chunk intersecting the tile box in one batch.
+
+        Boxes spanning more than ``PREFETCH_MAX_CHUNKS`` chunks are left to
+        load lazily, since a search rarely touches all of them. Chunks that
+        do not exist yet are only generated with ``generate=True``.
+        """
+        min_chunk_q, min_chunk_r = chunk_coords_for(min_q, min_r)
+        max_chunk_q, max_chunk_r = chunk_coords_for(max_q, max_r)
+        span = (max_chunk_q - min_chunk_q + 1) * (max_chunk_r - min_chunk_r + 1)
+        if span > PREFETCH_MAX_CHUNKS:
+            return
+        self.prefetch_chunks(
+            (
+                (chunk_q, chunk_r)
+                for chunk_q in range(min_chunk_q, max_chunk_q + 1)
+                for chunk_r in range(min_chunk_r, max_chunk_r + 1)
+            ),
+            generate=generate,
+        )
+
+    def prefetch_around(self, tiles, margin=PREFETCH_MARGIN, generate=False):
+        """Prefetch the bounding box of ``tiles`` grown by ``margin``."""
+        qs = [q for q, _ in tiles]
+        rs = [r for _, r in tiles]
+        self.prefetch_bounds(
+            min(qs) - margin,
+            min(rs) - margin,
+            max(qs) + margin,
+            max(rs) + margin,
+            generate=generate,
+        )
+
+    def all_grids(self):
+        keys = self.chunk_keys()
+        self.prefetch_chunks(keys)
+        return [grid for grid in (self.get_grid(*key) for key in keys) if grid is not None]
+
+    def get_grid(self, chunk_q, chunk_r):
+        key = (chunk_q, chunk_r)
+        try:
+            return self._grids[key]
+        except KeyError:
+            grid = self._fetch_grid(chunk_q, chunk_r)
+            self._grids[key] = grid
+            return grid
+
+    def peek_grid(self, chunk_q, chunk_r):
+        """``get_grid`` that never generates: a chunk that does not exist yet is None."""
+        key = (chunk_q, chunk_r)
+        if key not in self._grids and key not in self._absent:
+            self.prefetch_chunks([key])
+            if key not in self._grids:
+                self._absent.add(key)
+        return self._grids.get(key)
+
+    def grid_for(self, q, r):
+        return self.get_grid(q // DEFAULT_CHUNK_SIZE, r // DEFAULT_CHUNK_SIZE)
+
+    def peek_grid_for(self, q, r):
+        return self.peek_grid(q // DEFAULT_CHUNK_SIZE, r // DEFAULT_CHUNK_SIZE)
+
+    def get_tile(self, q, r):
+        grid = self.grid_for(q, r)
+        if grid is None:
+            return None
+        return grid.tile_at(q, r)
+
+    def has_tile(self, q, r):
+        grid = self.grid_for(q, r)
+        return grid is not None and grid.contains(q, r)
+
+    def get_cost(self, q, r):
+        grid = self.grid_for(q, r)
+        if grid is None:
+            return None
+        return grid.cost_at(q, r)
+
+    def get_province(self, q, r):
+        grid = self.grid_for(q, r)
+        if grid is None:
+            return None
+        return grid.province_at(q, r)
+
+
+def _unpack_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
@@ -0,0 +1,324 @@
+import heapq
+import threading
+
+from world.caches import VersionedCache
+from world.grid import NEIGHBOR_OFFSETS, neighbor_table
+from world.pathfinding import hex_distance, search_path
+from world.terrain import TERRAIN_CODE_COSTS
+
+ENTRANCE_WIDTH = 32
+# Abstract edges dropped for being cut by blockers before falling back to a
+# flat search.
+MAX_DROPPED_EDGES = 8
+INFINITY = float("inf")
+
+_PORTAL_GRAPHS = VersionedCache()
+
+
+class PortalGraph:
+    """Abstract HPA* graph: portal tiles on chunk borders and the costs between them.
+
+    Chunks are linked lazily the first time a search touches them, so the
+    graph only ever covers the part of the world that has been pathed over.
+    """
+
+    def __init__(self):
+        self.portals = {}
+        self.inter_edges = {}
+        self.intra_edges = {}
+        self._linked_pairs = set()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def ensure_chunk(self, tile_cache, grid):
+        key = (grid.chunk_q, grid.chunk_r)
+        edges = self.intra_edges.get(key)
+        if edges is not None:
+            return edges
+        with self._lock:
+            edges = self.intra_edges.get(key)
+            if edges is None:
+                self._link_borders(tile_cache, grid)
+                portals = self.portals.get(key, set())
+                edges = {}
+                for portal in portals:
+                    costs = _chunk_costs(grid, portal, portals - {portal})
+                    edges[portal] = list(costs.items())
+                self.intra_edges[key] = edges
+        return edges
+
+    def precompute(self, tile_cache, grids):
+        for grid in grids:
+            self.ensure_chunk(tile_cache, grid)
+
+    def _link_borders(self, tile_cache, grid):
+        key = (grid.chunk_q, grid.chunk_r)
+        crossings = {}
+        for tile in _border_tiles(grid):
+            if grid.cost_at(*tile) is None:
+                continue
+            q, r = tile
+            for dq, dr in NEIGHBOR_OFFSETS:
+                neighbor = (q + dq, r + dr)
+                if grid.index(*neighbor) >= 0:
+                    continue
+                # Chunks not generated yet are linked once they exist, under
+                # the terrain version that adds them.
+                other = tile_cache.peek_grid_for(*neighbor)
+                if other is None or other.cost_at(*neighbor) is None:
+                    continue
+                other_key = (other.chunk_q, other.chunk_r)
+                if key < other_key:
+                    pair, crossing = (key, other_key), (tile, neighbor)
+                else:
+                    pair, crossing = (other_key, key), (neighbor, tile)
+                if pair in self._linked_pairs:
+                    continue
+                crossings.setdefault(pair, []).append(crossing)
+
+        for pair, pair_crossings in crossings.items():
+            low_key, high_key = pair
+            low_grid = grid if low_key == key else tile_cache.get_grid(*low_key)
+            high_grid = grid if high_key == key else tile_cache.get_grid(*high_key)
+            for low_tile, high_tile in _entrances(pair_crossings):
+                self.portals.setdefault(low_key, set()).add(low_tile)
+                self.portals.setdefault(high_key, set()).add(high_tile)
+                self.inter_edges.setdefault(low_tile, []).append(
+                    (high_tile, high_grid.cost_at(*high_tile))
+                )
+                self.inter_edges.setdefault(high_tile, []).append(
+                    (low_tile, low_grid.cost_at(*low_tile))
+                )
+            self._linked_pairs.add(pair)
+
+
+def get_portal_graph(tile_cache):
+    if tile_cache.portal_graph is not None:
+        return tile_cache.portal_graph
+    key = tile_cache.cache_key()
+    graph = None
+    if key is not None:
+        graph = _PORTAL_GRAPHS.get(*key)
+    if graph is None:
+        graph = PortalGraph()
+        if key is not None:
+            _PORTAL_GRAPHS.set(*key, graph)
+    tile_cache.portal_graph = graph
+    return graph
+
+
+def find_path_hierarchical(
+    tile_cache, start, goal, blocked=None, graph=None, stats=None, max_nodes=20000
+):
+    if start == goal:
+        return [start]
+
+    blocked = blocked or set()
+    if start in blocked or goal in blocked:
+        return None
+    if not tile_cache.has_tile(*start) or tile_cache.get_cost(*goal) is None:
+        return None
+
+    graph = graph or get_portal_graph(tile_cache)
+    start_grid = tile_cache.grid_for(*start)
+    goal_grid = tile_cache.grid_for(*goal)
+    goal_key = (goal_grid.chunk_q, goal_grid.chunk_r)
+    graph.ensure_chunk(tile_cache, start_grid)
+    graph.ensure_chunk(tile_cache, goal_grid)
+
+    start_portals = graph.portals.get((start_grid.chunk_q, start_grid.chunk_r), set())
+    goal_portals = graph.portals.get(goal_key, set())
+    start_edges = _chunk_costs(start_grid, start, start_portals - blocked, blocked)
+    goal_edges = _chunk_costs(goal_grid, goal, goal_portals - blocked, blocked, reverse=True)
+
+    direct_path = None
+    direct_cost = None
+    if start_grid is goal_grid:
+        area = start_grid.size * start_grid.size
+        direct_path, _ = search_path(
+            start_grid.cost_at, start, goal, blocked, area, stats=stats
+        )
+        if direct_path:
+            direct_cost = sum(start_grid.cost_at(*step) for step in direct_path[1:])
+
+    # Intra-chunk portal edges are costed, and entrances picked, without units
+    # in the way. When blockers cut an edge, drop it and search the abstract
+    # graph again; past a few drops, or once no route is left, fall back to a
+    # flat search bounded by ``max_nodes``.
+    dropped = set()
+    while len(dropped) <= MAX_DROPPED_EDGES:
+        route, route_cost = _abstract_search(
+            tile_cache,
+            graph,
+            start,
+            goal,
+            goal_key,
+            start_edges,
+            goal_edges,
+            blocked,
+            stats,
+            dropped,
+        )
+        if direct_cost is not None and (route is None or direct_cost <= route_cost):
+            return direct_path
+        if route is None:
+            break
+        path, failed_edge = _refine(tile_cache, route, blocked, stats)
+        if failed_edge is None:
+            return path
+        dropped.add(failed_edge)
+
+    if not blocked:
+        # Without blockers the abstract graph is exact: no route means no path.
+        return direct_path
+    path, _ = search_path(tile_cache.get_cost, start, goal, blocked, max_nodes, stats=stats)
+    return path
+
+
+def _abstract_search(
+    tile_cache, graph, start, goal, goal_key, start_edges, goal_edges, blocked, stats, dropped
+):
+    open_heap = [(hex_distance(start, goal), 0, 0, start)]
+    counter = 0
+    came_from = {}
+    g_score = {start: 0}
+
+    while open_heap:
+        _, current_cost, _, current = heapq.heappop(open_heap)
+        if current_cost > g_score[current]:
+            continue
+        if stats is not None:
+            stats["abstract_expanded"] = stats.get("abstract_expanded", 0) + 1
+        if current == goal:
+            return _reconstruct(came_from, goal), current_cost
+
+        if current == start:
+            edges = list(start_edges.items())
+        else:
+            grid = tile_cache.grid_for(*current)
+            edges = list(graph.ensure_chunk(tile_cache, grid).get(current, ()))
+            if (grid.chunk_q, grid.chunk_r) == goal_key and current in goal_edges:
+                edges.append((goal, goal_edges[current]))
+        edges.extend(graph.inter_edges.get(current, ()))
+
+        for neighbor, step_cost in edges:
+            if neighbor in blocked or (current, neighbor) in dropped:
+                continue
+            tentative = current_cost + step_cost
+            if tentative < g_score.get(neighbor, float("inf")):
+                g_score[neighbor] = tentative
+                came_from[neighbor] = current
+                counter += 1
+                priority = tentative + hex_distance(neighbor, goal)
+                heapq.heappush(open_heap, (priority, tentative, counter, neighbor))
+
+    return None, None
+
+
+def _refine(tile_cache, route, blocked, stats):
+    """``(path, None)`` for ``route``, or ``(None, edge)`` for the first abstract
+    edge that ``blocked`` cuts."""
+    path = [route[0]]
+    for current, following in zip(route, route[1:]):
+        grid = tile_cache.grid_for(*current)
+        if grid.index(*following) < 0:
+            path.append(following)
+            continue
+        segment, _ = search_path(
+            grid.cost_at, current, following, blocked, grid.size * grid.size, stats=stats
+        )
+        if segment is None:
+            return None, (current, following)
+        path.extend(segment[1:])
+    return path, None
+
+
+def _chunk_costs(grid, source, targets, blocked=(), reverse=False):
+    remaining = {grid.index(*target) for target in targets}
+    remaining.discard(-1)
+    found = {}
+    if not remaining:
+        return found
+
+    size = grid.size
+    base_q = grid.base_q
+    base_r = grid.base_r
+    costs = [TERRAIN_CODE_COSTS[code] for code in grid.terrain]
+    for tile in blocked:
+        index = grid.index(*tile)
+        if index >= 0:
+            costs[index] = None
+    source_index = grid.index(*source)
+    table = neighbor_table(size)
+    best = [INFINITY] * (size * size)
+    best[source_index] = 0
+    open_heap = [(0, source_index)]
+
+    while open_heap and remaining:
+        current_cost, current = heapq.heappop(open_heap)
+        if current_cost > best[current]:
+            continue
+        if current in remaining:
+            remaining.discard(current)
+            dq, dr = divmod(current, size)
+            found[(base_q + dq, base_r + dr)] = current_cost
+        entry_cost = costs[current]
+        for neighbor in table[current]:
+            step_cost = costs[neighbor]
+            if step_cost is None:
+                continue
+            tentative = current_cost + (entry_cost if reverse else step_cost)
+            if tentative < best[neighbor]:
+                best[neighbor] = tentative
+                heapq.heappush(open_heap, (tentative, neighbor))
+
+    return found
+
+
+def _border_tiles(grid):
+    last = grid.size - 1
+    for dq in range(grid.size):
+        if dq in (0, last):
+            drs = range(grid.size)
+        else:
+            drs = (0, last)
+        for dr in drs:
+            yield grid.base_q + dq, grid.base_r + dr
+
+
+def _entrances(crossings):
+    crossings.sort()
+    runs = []
+    run = []
+    for crossing in crossings:
+        if run and (
+            hex_distance(run[-1][0], crossing[0]) > 1
+            or hex_distance(run[-1][1], crossing[1]) > 1
+        ):
+            runs.append(run)
+            run = []
+        run.append(crossing)
+    if run:
+        runs.append(run)
+
+    for run in runs:
+        for offset in range(0, len(run), ENTRANCE_WIDTH):
+            segment = run[offset:offset + ENTRANCE_WIDTH]
+            yield segment[len(segment) // 2]
+
+
+def _reconstruct(came_from, current):
+    route = [current]
+    while current in came_from:
+        current = came_from[current]
+        route.append(current)
+    route.reverse()
+    return route
@@ -0,0 +1,253 @@
+"""Pure chunk layouts: terrain, provinces, lands and kingdoms for one chunk.
+
+Nothing here touches Django, so layouts can be computed in worker processes
+and benchmarked standalone. A layout depends only on its job tuple.
+"""
+
+import random
+from collections import deque
+
+import numpy as np
+
+from world.grid import NEIGHBOR_OFFSETS
+from world.noise import chunk_terrain
+from world.terrain import TERRAIN_CODE_COSTS
+
+_PASSABLE_CODES = np.array([cost is not None for cost in TERRAIN_CODE_COSTS])
+
+
+def chunk_seed(world_seed, chunk_q, chunk_r):
+    seed = (world_seed or 0) ^ (chunk_q * 1000003) ^ (chunk_r * 2000003)
+    return seed & 0xFFFFFFFFFFFFFFFF
+
+
+class IndexedSet:
+    """Set with O(1) add, remove and uniform random choice.
+
+    Items live in a list with a position map; removal swaps the last item into
+    the freed slot. Order depends only on the sequence of operations, so
+    choices are reproducible for a seeded ``rng``.
+    """
+
+    __slots__ = ("_items", "_positions")
+
+    def __init__(self, items=()):
+        self._items = []
+        self._positions = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def remove(self, item):
+        position = self._positions.pop(item)
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def choice(self, rng):
+        return self._items[rng.randrange(len(self._items))]
+
+
+def _tile_neighbors(tile):
+    q, r = tile
+    return [(q + dq, r + dr) for dq, dr in NEIGHBOR_OFFSETS]
+
+
+def _grow_group(seed, unassigned, rng, target_size, neighbors_of):
+    group = []
+    queue = deque([seed])
+    seen = {seed}
+
+    while queue and len(group) < target_size:
+        current = queue.popleft()
+        if current not in unassigned:
+            continue
+        unassigned.remove(current)
+        group.append(current)
+        neighbors = list(neighbors_of(current))
+        rng.shuffle(neighbors)
+        for neighbor in neighbors:
+            if neighbor in unassigned and neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+
+    return group
+
+
+def _partition(nodes, neighbors_of, rng, min_size, max_size):
+    """Split ``nodes`` into connected groups of ``min_size`` to ``max_size`` nodes.
+
+    Each group grows breadth-first from a random unassigned seed; groups are
+    smaller when they run out of connected unassigned neighbours.
+    """
+    groups = []
+    unassigned = IndexedSet(nodes)
+
+    while unassigned:
+        seed = unassigned.choice(rng)
+        target_size = rng.randint(min_size, max_size)
+        groups.append(_grow_group(seed, unassigned, rng, target_size, neighbors_of))
+
+    return groups
+
+
+def _build_tile_adjacency(tile_to_province):
+    adjacency = {}
+    for (q, r), province_id in tile_to_province.items():
+        adjacency.setdefault(province_id, set())
+        for dq, dr in NEIGHBOR_OFFSETS:
+            neighbor = (q + dq, r + dr)
+            neighbor_province = tile_to_province.get(neighbor)
+            if neighbor_province is not None and neighbor_province != province_id:
+                adjacency[province_id].add(neighbor_province)
+    return adjacency
+
+
+class ChunkLayout:
+    """A generated chunk in chunk-local indices, before anything is persisted.
+
+    ``terrain`` holds the terrain code of every tile in ``ChunkGrid`` order.
+    ``provinces`` holds each province's tiles and ``towns`` its town tile;
+    ``province_lands`` maps province index to land index and ``land_kingdoms``
+    maps land index to kingdom index (empty when kingdoms are skipped).
+    """
+
+    __slots__ = (
+        "chunk_q",
+        "chunk_r",
+        "size",
+        "terrain",
+        "provinces",
+        "towns",
+        "province_lands",
+        "land_count",
+        "land_kingdoms",
+        "kingdom_count",
+    )
+
+    def __init__(self, chunk_q, chunk_r, size):
+        self.chunk_q = chunk_q
+        self.chunk_r = chunk_r
+        self.size = size
+        self.terrain = b""
+        self.provinces = []
+        self.towns = []
+        self.province_lands = []
+        self.land_count = 0
+        self.land_kingdoms = []
+        self.kingdom_count = 0
+
+
+def layout_chunk(
+    chunk_q,
+    chunk_r,
+    size,
+    rng,
+    world_seed,
+    province_min,
+    province_max,
+    land_min,
+    land_max,
+    kingdom_min,
+    kingdom_max,
+    no_kingdoms,
+):
+    layout = ChunkLayout(chunk_q, chunk_r, size)
+    base_q = chunk_q * size
+    base_r = chunk_r * size
+    terrain = chunk_terrain(world_seed, chunk_q, chunk_r, size)
+    layout.terrain = terrain.tobytes()
+    # Provinces, and so towns, only cover tiles units can stand on.
+    tiles = [
+        (base_q + index // size, base_r + index % size)
+        for index in np.flatnonzero(_PASSABLE_CODES[terrain]).tolist()
+    ]
+
+    tile_to_province = {}
+    for group in _partition(tiles, _tile_neighbors, rng, province_min, province_max):
+        province_index = len(layout.provinces)
+        layout.provinces.append(group)
+        for tile in group:
+            tile_to_province[tile] = province_index
+
+    layout.towns = [rng.choice(group) for group in layout.provinces]
+
+    province_adjacency = _build_tile_adjacency(tile_to_province)
+    province_groups = _partition(
+        range(len(layout.provinces)),
+        lambda node: province_adjacency.get(node, ()),
+        rng,
+        land_min,
+        land_max,
+    )
+    layout.province_lands = [None] * len(layout.provinces)
+    for land_index, group in enumerate(province_groups):
+        for province_index in group:
+            layout.province_lands[province_index] = land_index
+    layout.land_count = len(province_groups)
+
+    if not no_kingdoms:
+        land_adjacency = {land_index: set() for land_index in range(layout.land_count)}
+        for province_index, neighbors in province_adjacency.items():
+            land_index = layout.province_lands[province_index]
+            for neighbor_index in neighbors:
+                neighbor_land = layout.province_lands[neighbor_index]
+                if neighbor_land != land_index:
+                    land_adjacency[land_index].add(neighbor_land)
+
+        land_groups = _partition(
+            range(layout.land_count),
+            lambda node: land_adjacency.get(node, ()),
+            rng,
+            kingdom_min,
+            kingdom_max,
+        )
+        layout.land_kingdoms = [None] * layout.land_count
+        for kingdom_index, group in enumerate(land_groups):
+            for land_index in group:
+                layout.land_kingdoms[land_index] = kingdom_index
+        layout.kingdom_count = len(land_groups)
+
+    return layout
+
+
+def layout_job(job):
+    (
+        chunk_q,
+        chunk_r,
+        size,
+        seed,
+        world_seed,
+        province_min,
+        province_max,
+        land_min,
+        land_max,
+        kingdom_min,
+        kingdom_max,
+        no_kingdoms,
+    ) = job
+    return layout_chunk(
+        chunk_q,
+        chunk_r,
+        size,
+        random.Random(seed),
+        world_seed,
+        province_min,
+        province_max,
+        land_min,
+        land_max,
+        kingdom_min,
+        kingdom_max,
+        no_kingdoms,
+    )
@@ -0,0 +1,102 @@
+"""Chunk layout scaling benchmark.
+
+Runs without Django or a database::
+
+    python -m world.layout_benchmarks --sizes 32 64 128 256 512
+
+and through ``manage.py benchmark_generation`` with the same options.
+"""
+
+import argparse
+import math
+import time
+
+from world.layout import chunk_seed, layout_job
+
+DEFAULT_SIZES = (32, 64, 128, 256, 512)
+
+
+def run_layout_benchmarks(sizes=DEFAULT_SIZES, seed=1, repeat=1, no_kingdoms=False):
+    rows = []
+    for size in sizes:
+        job = (0, 0, size, chunk_seed(seed, 0, 0), seed, 8, 24, 8, 24, 1, 4, no_kingdoms)
+        timings = []
+        layouts = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            layouts.append(layout_job(job))
+            timings.append(time.perf_counter() - started)
+        layout = layouts[0]
+        rows.append(
+            {
+                "size": size,
+                "tiles": size * size,
+                "provinces": len(layout.provinces),
+                "lands": layout.land_count,
+                "kingdoms": layout.kingdom_count,
+                "ms_best": 1000 * min(timings),
+                "us_per_tile": 1e6 * min(timings) / (size * size),
+                "deterministic": all(_same_layout(layout, other) for other in layouts[1:]),
+            }
+        )
+    for previous, row in zip(rows, rows[1:]):
+        # Exponent k in time ~ tiles**k between consecutive sizes; 1.0 is linear.
+        row["scaling"] = math.log(row["ms_best"] / previous["ms_best"]) / math.log(
+            row["tiles"] / previous["tiles"]
+        )
+    return {"seed": seed, "repeat": repeat, "rows": rows}
+
+
+def format_report(report):
+    lines = [
+        f"seed={report['seed']} repeat={report['repeat']}",
+        f"{'size':>5} {'tiles':>8} {'provinces':>9} {'lands':>6} {'kingdoms':>8} "
+        f"{'ms best':>9} {'us/tile':>8} {'scaling':>7} {'stable':>6}",
+    ]
+    for row in report["rows"]:
+        scaling = f"{row['scaling']:.2f}" if "scaling" in row else "-"
+        lines.append(
+            f"{row['size']:>5} {row['tiles']:>8} {row['provinces']:>9} {row['lands']:>6} "
+            f"{row['kingdoms']:>8} {row['ms_best']:>9.1f} {row['us_per_tile']:>8.2f} "
+            f"{scaling:>7} {'yes' if row['deterministic'] else 'NO':>6}"
+        )
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=2,
+        help="Runs per size; the best time is reported and runs are compared for equality.",
+    )
+    parser.add_argument("--no-kingdoms", action="store_true")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chunk layout generation.")
+    add_arguments(parser)
+    options = parser.parse_args(argv)
+    report = run_layout_benchmarks(
+        sizes=options.sizes,
+        seed=options.seed,
+        repeat=options.repeat,
+        no_kingdoms=options.no_kingdoms,
+    )
+    print(format_report(report))
+
+
+def _same_layout(first, second):
+    return (
+        first.terrain == second.terrain
+        and first.provinces == second.provinces
+        and first.towns == second.towns
+        and first.province_lands == second.province_lands
+        and first.land_kingdoms == second.land_kingdoms
+    )
+
+
+if __name__ == "__main__":
+    main()
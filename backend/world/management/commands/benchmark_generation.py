@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from world.layout_benchmarks import add_arguments, format_report, run_layout_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark chunk layout generation across chunk sizes without touching the database."
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        report = run_layout_benchmarks(
+            sizes=options["sizes"],
+            seed=options["seed"],
+            repeat=options["repeat"],
+            no_kingdoms=options["no_kingdoms"],
+        )
+        self.stdout.write(format_report(report))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from world.benchmarks import add_arguments, format_report, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark pathfinding on synthetic worlds without touching the database."
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmarks(
+                chunks=options["chunks"],
+                density=options["density"],
+                seed=options["seed"],
+                queries=options["queries"],
+                max_nodes=options["max_nodes"],
+                mode=options["mode"],
+                measure_memory=not options["no_memory"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(format_report(report))
@@ -1,92 +1,17 @@
 import random
-from collections import deque
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connections, transaction
+from django.db.models import F
 
-from matches.models import Kingdom, Match
-from world.models import Chunk, Land, Province, Town
-
-NEIGHBOR_OFFSETS = (
-    (1, 0),
-    (1, -1),
-    (0, -1),
-    (-1, 0),
-    (-1, 1),
-    (0, 1),
-)
-
-
-def _chunk_seed(world_seed, chunk_q, chunk_r):
-    seed = (world_seed or 0) ^ (chunk_q * 1000003) ^ (chunk_r * 2000003)
-    return seed & 0xFFFFFFFFFFFFFFFF
-
-
-def _tile_neighbors(tile):
-    q, r = tile
-    return [(q + dq, r + dr) for dq, dr in NEIGHBOR_OFFSETS]
-
-
-def _grow_group(seed, unassigned, rng, target_size):
-    group = []
-    queue = deque([seed])
-    seen = {seed}
-
-    while queue and len(group) < target_size:
-        current = queue.popleft()
-        if current not in unassigned:
-            continue
-        unassigned.remove(current)
-        group.append(current)
-        neighbors = _tile_neighbors(current)
-        rng.shuffle(neighbors)
-        for neighbor in neighbors:
-            if neighbor in unassigned and neighbor not in seen:
-                seen.add(neighbor)
-                queue.append(neighbor)
-
-    return group
-
-
-def _group_graph(node_ids, adjacency, rng, min_size, max_size):
-    groups = []
-    unassigned = set(node_ids)
-
-    while unassigned:
-        seed = rng.choice(tuple(unassigned))
-        target_size = rng.randint(min_size, max_size)
-        queue = deque([seed])
-        seen = {seed}
-        group = []
-
-        while queue and len(group) < target_size:
-            node = queue.popleft()
-            if node not in unassigned:
-                continue
-            unassigned.remove(node)
-            group.append(node)
-            neighbors = list(adjacency.get(node, ()))
-            rng.shuffle(neighbors)
-            for neighbor in neighbors:
-                if neighbor in unassigned and neighbor not in seen:
-                    seen.add(neighbor)
-                    queue.append(neighbor)
-
-        groups.append(group)
-
-    return groups
-
-
-def _build_tile_adjacency(tile_to_province):
-    adjacency = {}
-    for (q, r), province_id in tile_to_province.items():
-        adjacency.setdefault(province_id, set())
-        for dq, dr in NEIGHBOR_OFFSETS:
-            neighbor = (q + dq, r + dr)
-            neighbor_province = tile_to_province.get(neighbor)
-            if neighbor_province and neighbor_province != province_id:
-                adjacency[province_id].add(neighbor_province)
-    return adjacency
+from matches.models import Match
+from world.caches import invalidate_match
+from world.generation import TIMING_PHASES, persist_layout
+from world.layout import chunk_seed, layout_job
+from world.models import Chunk
+from world.tiles import write_terrain_snapshot
 
 
 class Command(BaseCommand):
@@ -108,6 +33,12 @@ class Command(BaseCommand):
         parser.add_argument("--kingdom-min", type=int, default=1)
         parser.add_argument("--kingdom-max", type=int, default=4)
         parser.add_argument("--no-kingdoms", action="store_true")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Compute chunk layouts in this many processes; output matches --workers 1.",
+        )
 
     def handle(self, *args, **options):
         match_id = options["match"]
@@ -125,7 +56,10 @@ class Command(BaseCommand):
         kingdom_min = options["kingdom_min"]
         kingdom_max = options["kingdom_max"]
         no_kingdoms = options["no_kingdoms"]
+        workers = options["workers"]
 
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
         if (chunk_q is None) != (chunk_r is None):
             raise CommandError("Provide both --chunk-q and --chunk-r.")
 
@@ -151,34 +85,41 @@ class Command(BaseCommand):
                 self.style.SUCCESS(f"Assigned world_seed={match.world_seed} to match.")
             )
 
+        existing = set(
+            Chunk.objects.filter(match=match).values_list("chunk_q", "chunk_r")
+        )
+        jobs = []
         for chunk_q, chunk_r in chunk_coords:
-            if Chunk.objects.filter(match=match, chunk_q=chunk_q, chunk_r=chunk_r).exists():
+            if (chunk_q, chunk_r) in existing:
                 self.stdout.write(
                     self.style.WARNING(
                         f"Chunk {chunk_q},{chunk_r} already exists for match {match.id}."
                     )
                 )
                 continue
+            jobs.append(
+                (
+                    chunk_q,
+                    chunk_r,
+                    size,
+                    chunk_seed(match.world_seed, chunk_q, chunk_r),
+                    match.world_seed,
+                    province_min,
+                    province_max,
+                    land_min,
+                    land_max,
+                    kingdom_min,
+                    kingdom_max,
+                    no_kingdoms,
+                )
+            )
 
-            seed = _chunk_seed(match.world_seed, chunk_q, chunk_r)
-            rng = random.Random(seed)
-
+        generated = 0
+        timings = dict.fromkeys(TIMING_PHASES, 0.0)
+        for seed, layout in self._layouts(jobs, workers, timings):
             with transaction.atomic():
-                chunk = self._generate_chunk(
-                    match=match,
-                    chunk_q=chunk_q,
-                    chunk_r=chunk_r,
-                    size=size,
-                    rng=rng,
-                    province_min=province_min,
-                    province_max=province_max,
-                    land_min=land_min,
-                    land_max=land_max,
-                    kingdom_min=kingdom_min,
-                    kingdom_max=kingdom_max,
-                    no_kingdoms=no_kingdoms,
-                    seed=seed,
-                )
+                chunk = persist_layout(match, layout, seed, timings)
+            generated += 1
 
             self.stdout.write(
                 self.style.SUCCESS(
@@ -189,104 +130,50 @@ class Command(BaseCommand):
                 )
             )
 
-    def _generate_chunk(
-        self,
-        match,
-        chunk_q,
-        chunk_r,
-        size,
-        rng,
-        province_min,
-        province_max,
-        land_min,
-        land_max,
-        kingdom_min,
-        kingdom_max,
-        no_kingdoms,
-        seed,
-    ):
-        base_q = chunk_q * size
-        base_r = chunk_r * size
-        tiles = [(base_q + dq, base_r + dr) for dq in range(size) for dr in range(size)]
-
-        unassigned = set(tiles)
-        tile_to_province = {}
-        province_to_tiles = {}
-        province_ids = []
-
-        while unassigned:
-            seed_tile = rng.choice(tuple(unassigned))
-            target_size = rng.randint(province_min, province_max)
-            group = _grow_group(seed_tile, unassigned, rng, target_size)
-            if not group:
-                continue
-            province = Province.objects.create(match=match)
-            province_ids.append(province.id)
-            for tile in group:
-                tile_to_province[tile] = province.id
-                province_to_tiles.setdefault(province.id, []).append(tile)
-
-        for province_id, tiles in province_to_tiles.items():
-            q, r = rng.choice(tiles)
-            Town.objects.create(match=match, province_id=province_id, q=q, r=r)
-
-        province_adjacency = _build_tile_adjacency(tile_to_province)
-        province_groups = _group_graph(
-            province_ids, province_adjacency, rng, land_min, land_max
-        )
-
-        land_ids = []
-        province_to_land = {}
-        for group in province_groups:
-            land = Land.objects.create(match=match)
-            land_ids.append(land.id)
-            Province.objects.filter(id__in=group).update(land=land)
-            for province_id in group:
-                province_to_land[province_id] = land.id
-
-        kingdom_ids = []
-        if not no_kingdoms:
-            land_adjacency = {land_id: set() for land_id in land_ids}
-            for province_id, neighbors in province_adjacency.items():
-                land_id = province_to_land.get(province_id)
-                if land_id is None:
-                    continue
-                for neighbor_province_id in neighbors:
-                    neighbor_land_id = province_to_land.get(neighbor_province_id)
-                    if neighbor_land_id and neighbor_land_id != land_id:
-                        land_adjacency[land_id].add(neighbor_land_id)
-
-            land_groups = _group_graph(
-                land_ids, land_adjacency, rng, kingdom_min, kingdom_max
+        if generated:
+            self.stdout.write(
+                f"Timings for {generated} chunks: "
+                + ", ".join(
+                    f"{phase} {timings[phase] * 1000:.1f}ms" for phase in TIMING_PHASES
+                )
             )
-
-            for group in land_groups:
-                kingdom = Kingdom.objects.create(match=match)
-                kingdom_ids.append(kingdom.id)
-                Land.objects.filter(id__in=group).update(kingdom=kingdom)
-
-        cells = [
-            {
-                "q": q,
-                "r": r,
-                "province_id": province_id,
-                "terrain": "plains",
-            }
-            for (q, r), province_id in tile_to_province.items()
-        ]
-
-        meta = {
-            "seed": seed,
-            "province_count": len(province_ids),
-            "land_count": len(land_ids),
-            "kingdom_count": len(kingdom_ids),
-        }
-
-        return Chunk.objects.create(
-            match=match,
-            chunk_q=chunk_q,
-            chunk_r=chunk_r,
-            size=size,
-            tiles={"cells": cells},
-            meta=meta,
-        )
+            Match.objects.filter(id=match.id).update(
+                terrain_version=F("terrain_version") + 1
+            )
+            invalidate_match(match.id)
+            match.refresh_from_db(fields=["terrain_version"])
+            # Callers such as create_match run this inside their own transaction;
+            # a snapshot must not outlive a rollback. Outside one it runs now.
+            transaction.on_commit(lambda: self._write_snapshot(match))
+
+    def _write_snapshot(self, match):
+        snapshot_path = write_terrain_snapshot(match)
+        if snapshot_path:
+            self.stdout.write(self.style.SUCCESS(f"Wrote terrain snapshot {snapshot_path}."))
+
+    def _layouts(self, jobs, workers, timings):
+        """Yield ``(seed, layout)`` per job in order, computed in a pool when ``workers > 1``.
+
+        Layouts depend only on their job, and persistence always happens here
+        in job order, so the output is identical to the serial path.
+        """
+        if workers <= 1 or len(jobs) <= 1:
+            results = map(layout_job, jobs)
+            executor = None
+        else:
+            # Forked workers must not inherit open database connections.
+            if not transaction.get_connection().in_atomic_block:
+                connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(
+                layout_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))
+            )
+        try:
+            for job in jobs:
+                started = time.perf_counter()
+                layout = next(results)
+                timings["layout"] += time.perf_counter() - started
+                yield job[3], layout
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
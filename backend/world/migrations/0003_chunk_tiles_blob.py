@@ -0,0 +1,116 @@
+import struct
+import sys
+import zlib
+from array import array
+
+from django.db import migrations, models
+
+# Frozen copy of the packed chunk format (world.grid.ChunkGrid) and terrain
+# codes (world.terrain) as of this migration, so later changes to either
+# cannot alter what it reads or writes.
+CHUNK_MAGIC = b"WGC1"
+CHUNK_HEADER = struct.Struct("<4sHBxq")
+FLAG_ZLIB = 1
+FLAG_WIDE_PROVINCES = 2
+MAX_PROVINCE_OFFSET = 0xFFFFFFFF
+TERRAIN_CODES = (None, "plains", "forest", "hills", "swamp", "water", "mountain")
+TERRAIN_CODE_BY_NAME = {name: code for code, name in enumerate(TERRAIN_CODES) if name}
+DEFAULT_TERRAIN = "plains"
+
+
+def pack_cells(chunk_q, chunk_r, size, cells):
+    area = size * size
+    terrain = array("B", bytes(area))
+    provinces = array("q", bytes(8 * area))
+    for cell in cells:
+        dq = cell["q"] - chunk_q * size
+        dr = cell["r"] - chunk_r * size
+        if not (0 <= dq < size and 0 <= dr < size):
+            continue
+        index = dq * size + dr
+        terrain[index] = TERRAIN_CODE_BY_NAME.get(
+            cell.get("terrain"), TERRAIN_CODE_BY_NAME[DEFAULT_TERRAIN]
+        )
+        provinces[index] = cell.get("province_id") or 0
+
+    flags = FLAG_ZLIB
+    province_ids = {province_id for province_id in provinces if province_id}
+    province_base = min(province_ids) - 1 if province_ids else 0
+    if province_ids and max(province_ids) - province_base > MAX_PROVINCE_OFFSET:
+        flags |= FLAG_WIDE_PROVINCES
+        province_base = 0
+        packed = array("q", provinces)
+    else:
+        packed = array(
+            "I",
+            (province_id - province_base if province_id else 0 for province_id in provinces),
+        )
+    if sys.byteorder != "little":
+        packed.byteswap()
+    body = zlib.compress(bytes(terrain) + packed.tobytes())
+    return CHUNK_HEADER.pack(CHUNK_MAGIC, size, flags, province_base) + body
+
+
+def unpack_cells(chunk_q, chunk_r, data):
+    data = bytes(data)
+    magic, size, flags, province_base = CHUNK_HEADER.unpack_from(data)
+    if magic != CHUNK_MAGIC:
+        raise ValueError("not a packed chunk")
+    body = data[CHUNK_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    area = size * size
+    provinces = array("q" if flags & FLAG_WIDE_PROVINCES else "I")
+    provinces.frombytes(body[area:])
+    if sys.byteorder != "little":
+        provinces.byteswap()
+    if flags & FLAG_WIDE_PROVINCES:
+        province_base = 0
+    cells = []
+    for index, code in enumerate(body[:area]):
+        if not code:
+            continue
+        dq, dr = divmod(index, size)
+        offset = provinces[index]
+        cells.append(
+            {
+                "q": chunk_q * size + dq,
+                "r": chunk_r * size + dr,
+                "province_id": province_base + offset if offset else None,
+                "terrain": TERRAIN_CODES[code],
+            }
+        )
+    return cells
+
+
+def pack_tiles(apps, schema_editor):
+    Chunk = apps.get_model("world", "Chunk")
+    for chunk in Chunk.objects.filter(tiles_blob__isnull=True).iterator():
+        chunk.tiles_blob = pack_cells(
+            chunk.chunk_q, chunk.chunk_r, chunk.size, chunk.tiles.get("cells", [])
+        )
+        chunk.tiles = {}
+        chunk.save(update_fields=["tiles_blob", "tiles"])
+
+
+def unpack_tiles(apps, schema_editor):
+    Chunk = apps.get_model("world", "Chunk")
+    for chunk in Chunk.objects.filter(tiles_blob__isnull=False).iterator():
+        chunk.tiles = {"cells": unpack_cells(chunk.chunk_q, chunk.chunk_r, chunk.tiles_blob)}
+        chunk.tiles_blob = None
+        chunk.save(update_fields=["tiles_blob", "tiles"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("world", "0002_town"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chunk",
+            name="tiles_blob",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_tiles, unpack_tiles),
+    ]
@@ -39,6 +39,7 @@ class Chunk(models.Model):
     chunk_r = models.IntegerField()
     size = models.PositiveSmallIntegerField(default=64)
     tiles = models.JSONField(default=dict, blank=True)
+    tiles_blob = models.BinaryField(null=True, blank=True)
     meta = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -0,0 +1,135 @@
+"""Seeded fractal value noise for terrain, computed a whole chunk at a time.
+
+Noise is a function of the world seed and absolute tile coordinates only, so
+neighbouring chunks line up seamlessly whatever order they are generated in.
+"""
+
+import math
+
+import numpy as np
+
+from world.terrain import TERRAIN_CODE_BY_NAME
+
+OCTAVES = 5
+PERSISTENCE = 0.5
+ELEVATION_SCALE = 40.0
+MOISTURE_SCALE = 28.0
+ELEVATION_SALT = 0x454C4556
+MOISTURE_SALT = 0x4D4F4953
+BAND_TILES = 16384
+
+# Elevation cut-offs after contrast stretching to roughly [0, 1].
+WATER_LEVEL = 0.3
+HILLS_LEVEL = 0.65
+MOUNTAIN_LEVEL = 0.76
+# Moisture cut-offs for the lowlands between water and hills.
+SWAMP_MOISTURE = 0.68
+SWAMP_MAX_ELEVATION = 0.42
+FOREST_MOISTURE = 0.56
+
+_MASK = (1 << 64) - 1
+_SQRT3_2 = math.sqrt(3) / 2
+
+
+def chunk_terrain(world_seed, chunk_q, chunk_r, size):
+    """Terrain codes for a chunk as ``uint8`` in ``ChunkGrid`` index order."""
+    codes = np.empty(size * size, dtype=np.uint8)
+    elevation_seed = _mix(world_seed, ELEVATION_SALT)
+    moisture_seed = _mix(world_seed, MOISTURE_SALT)
+    r = np.arange(size) + chunk_r * size
+    # Work in bands of rows so the temporaries stay cache-sized on big chunks.
+    rows = max(1, BAND_TILES // size)
+    for start in range(0, size, rows):
+        stop = min(size, start + rows)
+        q = np.repeat(np.arange(start, stop) + chunk_q * size, size)
+        band_r = np.tile(r, stop - start)
+        # Axial to cartesian, so features are not stretched along the hex axes.
+        x = q + band_r * 0.5
+        y = band_r * _SQRT3_2
+        codes[start * size:stop * size] = _classify(
+            _stretch(fractal_noise(x, y, elevation_seed, ELEVATION_SCALE)),
+            _stretch(fractal_noise(x, y, moisture_seed, MOISTURE_SCALE)),
+        )
+    return codes
+
+
+def _classify(elevation, moisture):
+    codes = np.full(elevation.shape, TERRAIN_CODE_BY_NAME["plains"], dtype=np.uint8)
+    codes[moisture > FOREST_MOISTURE] = TERRAIN_CODE_BY_NAME["forest"]
+    codes[(moisture > SWAMP_MOISTURE) & (elevation < SWAMP_MAX_ELEVATION)] = (
+        TERRAIN_CODE_BY_NAME["swamp"]
+    )
+    codes[elevation > HILLS_LEVEL] = TERRAIN_CODE_BY_NAME["hills"]
+    codes[elevation > MOUNTAIN_LEVEL] = TERRAIN_CODE_BY_NAME["mountain"]
+    codes[elevation < WATER_LEVEL] = TERRAIN_CODE_BY_NAME["water"]
+    return codes
+
+
+def fractal_noise(x, y, seed, scale, octaves=OCTAVES, persistence=PERSISTENCE):
+    """Sum of ``octaves`` value-noise layers, each twice the frequency of the last."""
+    total = np.zeros(np.shape(x))
+    amplitude = 1.0
+    weight = 0.0
+    frequency = 1.0 / scale
+    for octave in range(octaves):
+        total += amplitude * value_noise(x * frequency, y * frequency, _mix(seed, octave))
+        weight += amplitude
+        amplitude *= persistence
+        frequency *= 2.0
+    return total / weight
+
+
+def value_noise(x, y, seed):
+    """Smoothly interpolated lattice noise in ``[0, 1)``."""
+    x0 = np.floor(x)
+    y0 = np.floor(y)
+    tx = _smoothstep(x - x0)
+    ty = _smoothstep(y - y0)
+    xi = x0.astype(np.int64)
+    yi = y0.astype(np.int64)
+    # Hash each lattice point once and gather, rather than hashing four
+    # corners per sample.
+    min_x = xi.min()
+    min_y = yi.min()
+    lattice_x = np.arange(min_x, xi.max() + 2)
+    lattice_y = np.arange(min_y, yi.max() + 2)
+    table = _lattice(lattice_x[:, None], lattice_y[None, :], seed).ravel()
+    stride = len(lattice_y)
+    corner = (xi - min_x) * stride + (yi - min_y)
+    top = _lerp(table.take(corner), table.take(corner + stride), tx)
+    bottom = _lerp(table.take(corner + 1), table.take(corner + stride + 1), tx)
+    return _lerp(top, bottom, ty)
+
+
+def _lattice(xi, yi, seed):
+    # splitmix64-style finaliser over the lattice coordinates; uint64 wraps.
+    h = (
+        xi.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        ^ yi.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+        ^ np.uint64(seed)
+    )
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    return (h >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def _mix(seed, salt):
+    value = ((seed or 0) * 0x9E3779B97F4A7C15 + salt * 0xBF58476D1CE4E5B9) & _MASK
+    value ^= value >> 31
+    return value
+
+
+def _smoothstep(t):
+    return t * t * (3.0 - 2.0 * t)
+
+
+def _lerp(a, b, t):
+    return a + (b - a) * t
+
+
+def _stretch(values):
+    # Averaged octaves cluster around 0.5; widen them back towards [0, 1].
+    return np.clip((values - 0.5) * 1.7 + 0.5, 0.0, 1.0)
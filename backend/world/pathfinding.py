@@ -1,15 +1,15 @@
 import heapq
 
-from world.terrain import movement_cost
+from world.caches import LRUCache
+from world.grid import DEFAULT_CHUNK_SIZE, NEIGHBOR_OFFSETS, chunk_coords_for
+from world.regions import same_region
 
-NEIGHBOR_OFFSETS = (
-    (1, 0),
-    (1, -1),
-    (0, -1),
-    (-1, 0),
-    (-1, 1),
-    (0, 1),
-)
+HIERARCHICAL_DISTANCE = DEFAULT_CHUNK_SIZE
+# Chunks one failed long-range search may generate on a lazy match.
+LAZY_SEARCH_MAX_CHUNKS = 8
+
+_REACHABLE_CACHE = LRUCache(max_entries=512)
+_PATH_CACHE = LRUCache(max_entries=2048)
 
 
 def hex_distance(a, b):
@@ -18,22 +18,84 @@ def hex_distance(a, b):
     return (abs(aq - bq) + abs(aq + ar - bq - br) + abs(ar - br)) // 2
 
 
-def find_path(tile_cache, start, goal, blocked=None, max_nodes=20000):
+def find_path(tile_cache, start, goal, blocked=None, max_nodes=20000, stats=None):
     if start == goal:
         return [start]
 
     blocked = blocked or set()
+    return cached_path(
+        tile_cache,
+        start,
+        goal,
+        blocked,
+        max_nodes,
+        # A fresh search that stops at max_nodes stops there every time, so
+        # its result is as cacheable as any other.
+        lambda: (_find_path(tile_cache, start, goal, blocked, max_nodes, stats), False),
+    )
+
+
+def cached_path(tile_cache, start, goal, blocked, max_nodes, search):
+    """Path from ``search()``, memoised per terrain version, endpoints and blocked set.
+
+    ``search()`` returns ``(path, exhausted)``; results of a search that ran
+    out of budget are not memoised, since retrying may get further. Occupancy
+    is part of the key, so moving units never makes an entry stale.
+    """
+    cache_key = tile_cache.cache_key()
+    if cache_key is None:
+        return search()[0]
+
+    query = (start, goal, frozenset(blocked), max_nodes)
+    cached = _PATH_CACHE.get(cache_key + query)
+    if cached is not None:
+        return list(cached) if cached else None
+    path, exhausted = search()
+    if not exhausted:
+        # Searching may generate chunks; the result belongs to the terrain it saw.
+        _PATH_CACHE.set(tile_cache.cache_key() + query, tuple(path) if path else ())
+    return path
+
+
+def invalidate_path_cache(match_id=None):
+    _PATH_CACHE.invalidate(match_id)
+
+
+def path_cache_stats():
+    return _PATH_CACHE.stats()
+
+
+def _find_path(tile_cache, start, goal, blocked, max_nodes, stats):
     if start in blocked or goal in blocked:
         return None
 
-    start_tile = tile_cache.get_tile(*start)
-    goal_tile = tile_cache.get_tile(*goal)
-    if start_tile is None or goal_tile is None:
+    tile_cache.prefetch_around((start, goal))
+    if not tile_cache.has_tile(*start):
         return None
-
-    if movement_cost(goal_tile.get("terrain")) is None:
+    if tile_cache.get_cost(*goal) is None:
         return None
+    if not same_region(tile_cache, start, goal):
+        return None
+
+    if hex_distance(start, goal) > HIERARCHICAL_DISTANCE:
+        return _find_path_hierarchical(tile_cache, start, goal, blocked, max_nodes, stats)
+
+    path, exhausted = search_path(
+        tile_cache.get_cost, start, goal, blocked, max_nodes, stats=stats
+    )
+    if path is None and exhausted:
+        if tile_cache.grid_for(*start) is not tile_cache.grid_for(*goal):
+            return _find_path_hierarchical(tile_cache, start, goal, blocked, max_nodes, stats)
+    return path
+
+
+def search_path(get_cost, start, goal, blocked, max_nodes, stats=None):
+    """A* over ``get_cost``; returns ``(path, exhausted)``.
 
+    ``exhausted`` is true when the search stopped at ``max_nodes`` rather than
+    running out of open tiles. Passing a ``ChunkGrid.cost_at`` keeps the
+    search inside that chunk. Expanded nodes are added to ``stats`` when given.
+    """
     open_heap = []
     counter = 0
     heapq.heappush(open_heap, (hex_distance(start, goal), counter, start))
@@ -44,11 +106,13 @@ def find_path(tile_cache, start, goal, blocked=None, max_nodes=20000):
     while open_heap:
         _, _, current = heapq.heappop(open_heap)
         if current == goal:
-            return _reconstruct_path(came_from, current)
+            _count_expanded(stats, visited)
+            return _reconstruct_path(came_from, current), False
 
         visited += 1
         if visited > max_nodes:
-            break
+            _count_expanded(stats, visited)
+            return None, True
 
         current_cost = g_score[current]
         cq, cr = current
@@ -56,10 +120,7 @@ def find_path(tile_cache, start, goal, blocked=None, max_nodes=20000):
             neighbor = (cq + dq, cr + dr)
             if neighbor in blocked:
                 continue
-            tile = tile_cache.get_tile(*neighbor)
-            if tile is None:
-                continue
-            step_cost = movement_cost(tile.get("terrain"))
+            step_cost = get_cost(*neighbor)
             if step_cost is None:
                 continue
             tentative = current_cost + step_cost
@@ -70,7 +131,145 @@ def find_path(tile_cache, start, goal, blocked=None, max_nodes=20000):
                 priority = tentative + hex_distance(neighbor, goal)
                 heapq.heappush(open_heap, (priority, counter, neighbor))
 
-    return None
+    _count_expanded(stats, visited)
+    return None, False
+
+
+def find_nearest_target(tile_cache, start, targets, blocked=None, max_nodes=20000):
+    """Dijkstra from ``start`` that stops at the cheapest reachable target.
+
+    Returns ``(target, path)`` or ``(None, None)`` when no target is reachable
+    within ``max_nodes`` expansions.
+    """
+    targets = set(targets)
+    if start in targets:
+        return start, [start]
+
+    blocked = blocked or set()
+    targets -= blocked
+    if not targets or start in blocked:
+        return None, None
+    tile_cache.prefetch_around(targets | {start})
+    if not tile_cache.has_tile(*start):
+        return None, None
+
+    get_cost = tile_cache.get_cost
+    open_heap = [(0, start)]
+    came_from = {}
+    g_score = {start: 0}
+    visited = 0
+
+    while open_heap:
+        current_cost, current = heapq.heappop(open_heap)
+        if current_cost > g_score[current]:
+            continue
+        if current in targets:
+            return current, _reconstruct_path(came_from, current)
+
+        visited += 1
+        if visited > max_nodes:
+            break
+
+        cq, cr = current
+        for dq, dr in NEIGHBOR_OFFSETS:
+            neighbor = (cq + dq, cr + dr)
+            if neighbor in blocked:
+                continue
+            step_cost = get_cost(*neighbor)
+            if step_cost is None:
+                continue
+            tentative = current_cost + step_cost
+            if tentative < g_score.get(neighbor, float("inf")):
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative
+                heapq.heappush(open_heap, (tentative, neighbor))
+
+    return None, None
+
+
+def reachable_tiles(tile_cache, start, move_points, blocked=None):
+    """Bounded Dijkstra flood fill: every tile enterable for at most ``move_points``.
+
+    Returns a dict of tile to cheapest cost, including ``start`` at 0.
+    """
+    blocked = blocked or set()
+    tile_cache.prefetch_around((start,), margin=move_points)
+    get_cost = tile_cache.get_cost
+    costs = {start: 0}
+    open_heap = [(0, start)]
+
+    while open_heap:
+        current_cost, current = heapq.heappop(open_heap)
+        if current_cost > costs[current]:
+            continue
+        cq, cr = current
+        for dq, dr in NEIGHBOR_OFFSETS:
+            neighbor = (cq + dq, cr + dr)
+            if neighbor in blocked:
+                continue
+            step_cost = get_cost(*neighbor)
+            if step_cost is None:
+                continue
+            tentative = current_cost + step_cost
+            if tentative <= move_points and tentative < costs.get(neighbor, float("inf")):
+                costs[neighbor] = tentative
+                heapq.heappush(open_heap, (tentative, neighbor))
+
+    return costs
+
+
+def cached_reachable_tiles(tile_cache, start, move_points, blocked=None):
+    blocked = frozenset(blocked or ())
+    cache_key = tile_cache.cache_key()
+    if cache_key is None:
+        return reachable_tiles(tile_cache, start, move_points, blocked)
+    key = cache_key + (start, move_points, blocked)
+    costs = _REACHABLE_CACHE.get(key)
+    if costs is None:
+        costs = reachable_tiles(tile_cache, start, move_points, blocked)
+        _REACHABLE_CACHE.set(key, costs)
+    return costs
+
+
+def _find_path_hierarchical(tile_cache, start, goal, blocked, max_nodes, stats):
+    from world.hierarchy import find_path_hierarchical
+
+    path = find_path_hierarchical(
+        tile_cache, start, goal, blocked=blocked, stats=stats, max_nodes=max_nodes
+    )
+    if path is None:
+        # Portals only link chunks that exist. Generate the first few missing
+        # chunks on the straight line towards the goal, not the whole box
+        # around both endpoints, and search once more if that added any.
+        missing = [
+            key
+            for key in _line_chunks(start, goal)
+            if tile_cache.may_generate(*key) and tile_cache.peek_grid(*key) is None
+        ]
+        cache_key = tile_cache.cache_key()
+        tile_cache.prefetch_chunks(missing[:LAZY_SEARCH_MAX_CHUNKS], generate=True)
+        if tile_cache.cache_key() != cache_key:
+            path = find_path_hierarchical(
+                tile_cache, start, goal, blocked=blocked, stats=stats, max_nodes=max_nodes
+            )
+    return path
+
+
+def _line_chunks(start, goal):
+    """Chunks crossed by the straight line from ``start`` to ``goal``, in order."""
+    steps = hex_distance(start, goal)
+    keys = {}
+    for step in range(steps + 1):
+        fraction = step / steps if steps else 0
+        q = round(start[0] + (goal[0] - start[0]) * fraction)
+        r = round(start[1] + (goal[1] - start[1]) * fraction)
+        keys.setdefault(chunk_coords_for(q, r))
+    return list(keys)
+
+
+def _count_expanded(stats, expanded):
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
 
 
 def _reconstruct_path(came_from, current):
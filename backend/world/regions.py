@@ -0,0 +1,178 @@
+from array import array
+
+from world.caches import VersionedCache
+from world.grid import DEFAULT_CHUNK_SIZE, NEIGHBOR_OFFSETS, chunk_coords_for, neighbor_table
+from world.terrain import TERRAIN_CODE_COSTS
+
+_REGION_INDEXES = VersionedCache()
+
+
+class RegionIndex:
+    """Connected-component labels of passable tiles, one label array per chunk.
+
+    Label 0 marks impassable or missing tiles; any two tiles sharing a
+    non-zero label are connected by passable terrain. ``open_labels`` are
+    regions that border chunks which may still be generated, so they can
+    grow into each other once that terrain exists.
+    """
+
+    def __init__(self, chunks, open_labels=frozenset()):
+        self._chunks = chunks
+        self._open_labels = open_labels
+
+    @property
+    def open_labels(self):
+        return self._open_labels
+
+    def chunk_labels(self):
+        """``((chunk_q, chunk_r), size, labels)`` for every indexed chunk."""
+        for key, (_, _, size, labels) in self._chunks.items():
+            yield key, size, labels
+
+    def label(self, q, r):
+        entry = self._chunks.get((q // DEFAULT_CHUNK_SIZE, r // DEFAULT_CHUNK_SIZE))
+        if entry is None:
+            return 0
+        base_q, base_r, size, labels = entry
+        dq = q - base_q
+        dr = r - base_r
+        if 0 <= dq < size and 0 <= dr < size:
+            return labels[dq * size + dr]
+        return 0
+
+    def same_region(self, a, b, may_generate=None):
+        """Whether ``b`` can be reached from ``a``.
+
+        With ``may_generate``, tiles in chunks it accepts that are not indexed
+        yet are unexplored: they, and open regions, count as reachable so the
+        caller runs the search instead of refusing.
+        """
+        if a == b:
+            return True
+        goal_label = self.label(*b)
+        if not goal_label:
+            return self._unexplored(b, may_generate)
+        goal_open = goal_label in self._open_labels
+        start_label = self.label(*a)
+        if start_label:
+            return start_label == goal_label or (
+                goal_open and start_label in self._open_labels
+            )
+        q, r = a
+        for dq, dr in NEIGHBOR_OFFSETS:
+            tile = (q + dq, r + dr)
+            label = self.label(*tile)
+            if label == goal_label:
+                return True
+            if goal_open and (
+                label in self._open_labels or self._unexplored(tile, may_generate)
+            ):
+                return True
+        return False
+
+    def _unexplored(self, tile, may_generate):
+        if may_generate is None:
+            return False
+        key = chunk_coords_for(*tile)
+        return key not in self._chunks and may_generate(*key)
+
+
+def build_region_index(tile_cache):
+    grids = tile_cache.all_grids()
+    by_key = {(grid.chunk_q, grid.chunk_r): grid for grid in grids}
+    parent = [0]
+    raw_labels = {}
+    open_labels = set()
+    for grid in grids:
+        raw_labels[(grid.chunk_q, grid.chunk_r)] = _label_chunk(grid, parent)
+
+    def find(label):
+        root = label
+        while parent[root] != root:
+            root = parent[root]
+        while parent[label] != root:
+            parent[label], label = root, parent[label]
+        return root
+
+    for grid in grids:
+        labels = raw_labels[(grid.chunk_q, grid.chunk_r)]
+        last = grid.size - 1
+        for index, label in enumerate(labels):
+            if not label:
+                continue
+            dq, dr = divmod(index, grid.size)
+            if 0 < dq < last and 0 < dr < last:
+                continue
+            q = grid.base_q + dq
+            r = grid.base_r + dr
+            for oq, orr in NEIGHBOR_OFFSETS:
+                neighbor = (q + oq, r + orr)
+                if grid.index(*neighbor) >= 0:
+                    continue
+                # Only chunks that exist are joined; probing must not generate more.
+                other_key = chunk_coords_for(*neighbor)
+                other = by_key.get(other_key)
+                if other is None:
+                    if tile_cache.may_generate(*other_key):
+                        open_labels.add(label)
+                    continue
+                other_labels = raw_labels.get((other.chunk_q, other.chunk_r))
+                other_index = other.index(*neighbor)
+                if other_labels is None or other_index < 0:
+                    continue
+                other_label = other_labels[other_index]
+                if other_label:
+                    root, other_root = find(label), find(other_label)
+                    if root != other_root:
+                        parent[max(root, other_root)] = min(root, other_root)
+
+    chunks = {}
+    for grid in grids:
+        labels = raw_labels[(grid.chunk_q, grid.chunk_r)]
+        for index, label in enumerate(labels):
+            if label:
+                labels[index] = find(label)
+        chunks[(grid.chunk_q, grid.chunk_r)] = (grid.base_q, grid.base_r, grid.size, labels)
+    return RegionIndex(chunks, frozenset(find(label) for label in open_labels))
+
+
+def get_region_index(tile_cache):
+    if tile_cache.region_index is not None:
+        return tile_cache.region_index
+    key = tile_cache.cache_key()
+    index = None
+    if key is not None:
+        index = _REGION_INDEXES.get(*key)
+    if index is None:
+        index = build_region_index(tile_cache)
+        if key is not None:
+            _REGION_INDEXES.set(*key, index)
+    if tile_cache.cache_key() == key:
+        tile_cache.region_index = index
+    return index
+
+
+def same_region(tile_cache, a, b):
+    return get_region_index(tile_cache).same_region(a, b, tile_cache.may_generate)
+
+
+def _label_chunk(grid, parent):
+    area = grid.size * grid.size
+    passable = [TERRAIN_CODE_COSTS[code] is not None for code in grid.terrain]
+    labels = array("l", bytes(array("l").itemsize * area))
+    table = neighbor_table(grid.size)
+
+    for seed in range(area):
+        if labels[seed] or not passable[seed]:
+            continue
+        label = len(parent)
+        parent.append(label)
+        labels[seed] = label
+        stack = [seed]
+        while stack:
+            current = stack.pop()
+            for neighbor in table[current]:
+                if passable[neighbor] and not labels[neighbor]:
+                    labels[neighbor] = label
+                    stack.append(neighbor)
+    return labels
@@ -0,0 +1,207 @@
+import heapq
+import threading
+
+from world.caches import LRUCache
+from world.grid import NEIGHBOR_OFFSETS
+from world.pathfinding import HIERARCHICAL_DISTANCE, cached_path, find_path, hex_distance
+from world.regions import same_region
+
+INFINITY = float("inf")
+
+_PLANNERS = LRUCache(max_entries=256)
+
+
+class DStarLite:
+    """D* Lite planner that keeps its search tree between replans.
+
+    The search runs backwards from ``goal``, so moving the start along the
+    route and adding or removing blocked tiles only repairs the part of the
+    tree those changes touch.
+    """
+
+    def __init__(self, tile_cache, start, goal, blocked=None, max_nodes=20000):
+        self.tile_cache = tile_cache
+        self.start = start
+        self.goal = goal
+        self.blocked = set(blocked or ())
+        self.max_nodes = max_nodes
+        self.expanded = 0
+        self.exhausted = False
+        self.lock = threading.Lock()
+        self._last_start = start
+        self._km = 0
+        self._g = {}
+        self._rhs = {goal: 0}
+        self._open = {}
+        self._heap = []
+        self._counter = 0
+        self._push(goal)
+
+    def plan(self, start, blocked):
+        if start != self.start:
+            self._km += hex_distance(self._last_start, start)
+            self._last_start = start
+            self.start = start
+
+        blocked = set(blocked)
+        changed = blocked ^ self.blocked
+        self.blocked = blocked
+        for tile in changed:
+            for neighbor in _neighbors(tile):
+                self._update(neighbor)
+            self._update(tile)
+
+        if not self._compute():
+            return None
+        return self._extract_path()
+
+    def _cost(self, tile):
+        if tile in self.blocked:
+            return None
+        return self.tile_cache.get_cost(*tile)
+
+    def _key(self, tile):
+        best = min(self._g.get(tile, INFINITY), self._rhs.get(tile, INFINITY))
+        return (best + hex_distance(self.start, tile) + self._km, best)
+
+    def _push(self, tile):
+        key = self._key(tile)
+        self._open[tile] = key
+        self._counter += 1
+        heapq.heappush(self._heap, (key, self._counter, tile))
+
+    def _top(self):
+        while self._heap:
+            key, _, tile = self._heap[0]
+            if self._open.get(tile) == key:
+                return key, tile
+            heapq.heappop(self._heap)
+        return (INFINITY, INFINITY), None
+
+    def _update(self, tile):
+        if tile != self.goal:
+            best = INFINITY
+            for neighbor in _neighbors(tile):
+                step_cost = self._cost(neighbor)
+                if step_cost is None:
+                    continue
+                candidate = step_cost + self._g.get(neighbor, INFINITY)
+                if candidate < best:
+                    best = candidate
+            self._rhs[tile] = best
+        self._open.pop(tile, None)
+        if self._g.get(tile, INFINITY) != self._rhs.get(tile, INFINITY):
+            self._push(tile)
+
+    def _compute(self):
+        start = self.start
+        expanded = 0
+        self.exhausted = False
+        while True:
+            top_key, tile = self._top()
+            start_g = self._g.get(start, INFINITY)
+            start_rhs = self._rhs.get(start, INFINITY)
+            if tile is None or (top_key >= self._key(start) and start_rhs == start_g):
+                break
+            expanded += 1
+            if expanded > self.max_nodes:
+                self.exhausted = True
+                break
+
+            new_key = self._key(tile)
+            if top_key < new_key:
+                self._push(tile)
+                continue
+            heapq.heappop(self._heap)
+            del self._open[tile]
+            g = self._g.get(tile, INFINITY)
+            rhs = self._rhs.get(tile, INFINITY)
+            if g > rhs:
+                self._g[tile] = rhs
+                for neighbor in _neighbors(tile):
+                    self._update(neighbor)
+            else:
+                self._g[tile] = INFINITY
+                for neighbor in _neighbors(tile):
+                    self._update(neighbor)
+                self._update(tile)
+
+        self.expanded += expanded
+        return self._rhs.get(start, INFINITY) < INFINITY
+
+    def _extract_path(self):
+        path = [self.start]
+        current = self.start
+        seen = {current}
+        while current != self.goal:
+            best_tile = None
+            best = INFINITY
+            for neighbor in _neighbors(current):
+                step_cost = self._cost(neighbor)
+                if step_cost is None:
+                    continue
+                candidate = step_cost + self._g.get(neighbor, INFINITY)
+                if candidate < best:
+                    best = candidate
+                    best_tile = neighbor
+            if best_tile is None or best_tile in seen:
+                return None
+            seen.add(best_tile)
+            path.append(best_tile)
+            current = best_tile
+        return path
+
+
+def replan_path(tile_cache, unit_id, start, goal, blocked=None, max_nodes=20000):
+    """Plan ``unit_id`` to ``goal`` reusing its previous D* Lite search when cached.
+
+    Long-range goals are handed to ``find_path`` so they get the hierarchical
+    search instead of one very large incremental tree. Results share
+    ``find_path``'s cache, so repeating a query with the same occupancy costs
+    nothing. A search cut off at ``max_nodes`` is neither cached nor kept as
+    the planner for the next call.
+    """
+    blocked = set(blocked or ())
+    if start == goal:
+        return [start]
+    if hex_distance(start, goal) > HIERARCHICAL_DISTANCE:
+        return find_path(tile_cache, start, goal, blocked=blocked, max_nodes=max_nodes)
+    return cached_path(
+        tile_cache,
+        start,
+        goal,
+        blocked,
+        max_nodes,
+        lambda: _replan(tile_cache, unit_id, start, goal, blocked, max_nodes),
+    )
+
+
+def _replan(tile_cache, unit_id, start, goal, blocked, max_nodes):
+    tile_cache.prefetch_around((start, goal))
+    if start in blocked or goal in blocked or tile_cache.get_cost(*goal) is None:
+        return None, False
+    if not tile_cache.has_tile(*start) or not same_region(tile_cache, start, goal):
+        return None, False
+
+    cache_key = tile_cache.cache_key()
+    key = None
+    planner = None
+    if cache_key is not None:
+        key = cache_key + (unit_id, goal)
+        planner = _PLANNERS.get(key)
+    if planner is None:
+        planner = DStarLite(tile_cache, start, goal, blocked, max_nodes=max_nodes)
+        if key is not None:
+            _PLANNERS.set(key, planner)
+    with planner.lock:
+        path = planner.plan(start, blocked)
+        exhausted = planner.exhausted
+    if exhausted and key is not None:
+        # A tree cut off mid-repair is no better a start than a fresh one.
+        _PLANNERS.delete(key)
+    return path, exhausted
+
+
+def _neighbors(tile):
+    q, r = tile
+    return [(q + dq, r + dr) for dq, dr in NEIGHBOR_OFFSETS]
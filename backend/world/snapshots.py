@@ -0,0 +1,102 @@
+"""Fixed-layout terrain snapshots: every chunk grid of a match in one buffer.
+
+A snapshot is a header, one index entry per chunk, then each chunk's terrain
+codes followed by its int64 province ids (8-byte aligned). The same layout
+backs shared-memory batches and the per-match files mapped read-only by
+``TileCache``.
+"""
+
+import mmap
+import os
+import struct
+
+from world.grid import ChunkGrid
+
+SNAPSHOT_MAGIC = b"WGT1"
+# magic, chunk count, match id, terrain version
+SNAPSHOT_HEADER = struct.Struct("<4sIqI")
+# chunk_q, chunk_r, size, terrain offset, province offset
+INDEX_ENTRY = struct.Struct("<iiHxxqq")
+PROVINCE_ITEMSIZE = 8
+
+
+class TerrainBuffer:
+    """Chunk grids viewed in place over a snapshot buffer."""
+
+    def __init__(self, buffer, layout, source=None):
+        self.buffer = buffer
+        self.layout = layout
+        self.source = source
+        self._index = {}
+        for chunk_q, chunk_r, size, terrain_offset, province_offset in layout:
+            self._index[(chunk_q, chunk_r)] = (size, terrain_offset, province_offset)
+
+    def chunk_keys(self):
+        return sorted(self._index)
+
+    def grid(self, chunk_q, chunk_r):
+        entry = self._index.get((chunk_q, chunk_r))
+        if entry is None:
+            return None
+        size, terrain_offset, province_offset = entry
+        area = size * size
+        terrain = self.buffer[terrain_offset:terrain_offset + area]
+        province_end = province_offset + area * PROVINCE_ITEMSIZE
+        provinces = self.buffer[province_offset:province_end].cast("q")
+        return ChunkGrid(chunk_q, chunk_r, size, terrain, provinces)
+
+
+def snapshot_layout(grids, offset=0):
+    """``(layout, end)`` for packing ``grids`` into a buffer starting at ``offset``."""
+    layout = []
+    for grid in grids:
+        area = grid.size * grid.size
+        terrain_offset = _align(offset)
+        province_offset = _align(terrain_offset + area)
+        offset = province_offset + area * PROVINCE_ITEMSIZE
+        layout.append((grid.chunk_q, grid.chunk_r, grid.size, terrain_offset, province_offset))
+    return layout, offset
+
+
+def write_grids(buffer, grids, layout):
+    for grid, (_, _, size, terrain_offset, province_offset) in zip(grids, layout):
+        area = size * size
+        buffer[terrain_offset:terrain_offset + area] = memoryview(grid.terrain).cast("B")
+        province_end = province_offset + area * PROVINCE_ITEMSIZE
+        buffer[province_offset:province_end] = memoryview(grid.provinces).cast("B")
+
+
+def write_snapshot_file(path, grids, match_id=0, terrain_version=0):
+    """Write ``grids`` to ``path`` atomically via a temporary file and rename."""
+    grids = list(grids)
+    data_start = SNAPSHOT_HEADER.size + INDEX_ENTRY.size * len(grids)
+    layout, end = snapshot_layout(grids, offset=data_start)
+    buffer = bytearray(end)
+    SNAPSHOT_HEADER.pack_into(buffer, 0, SNAPSHOT_MAGIC, len(grids), match_id, terrain_version)
+    for position, entry in enumerate(layout):
+        INDEX_ENTRY.pack_into(buffer, SNAPSHOT_HEADER.size + INDEX_ENTRY.size * position, *entry)
+    write_grids(memoryview(buffer), grids, layout)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(buffer)
+    os.replace(temp_path, path)
+
+
+def open_snapshot_file(path):
+    """Map a snapshot file read-only; returns ``(terrain, match_id, terrain_version)``."""
+    with open(path, "rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, count, match_id, terrain_version = SNAPSHOT_HEADER.unpack_from(mapped)
+    if magic != SNAPSHOT_MAGIC:
+        mapped.close()
+        raise ValueError(f"{path} is not a terrain snapshot")
+    layout = [
+        INDEX_ENTRY.unpack_from(mapped, SNAPSHOT_HEADER.size + INDEX_ENTRY.size * position)
+        for position in range(count)
+    ]
+    return TerrainBuffer(memoryview(mapped), layout, source=mapped), match_id, terrain_version
+
+
+def _align(offset):
+    return (offset + PROVINCE_ITEMSIZE - 1) // PROVINCE_ITEMSIZE * PROVINCE_ITEMSIZE
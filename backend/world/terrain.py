@@ -7,8 +7,18 @@ TERRAIN_COSTS = {
     "mountain": None,
 }
 
+DEFAULT_TERRAIN = "plains"
 DEFAULT_TERRAIN_COST = 1
 
+# Code 0 marks a missing tile; terrain names are numbered from 1.
+TERRAIN_CODES = (None,) + tuple(TERRAIN_COSTS)
+TERRAIN_CODE_BY_NAME = {name: code for code, name in enumerate(TERRAIN_CODES) if name}
+TERRAIN_CODE_COSTS = (None,) + tuple(TERRAIN_COSTS.values())
+
 
 def movement_cost(terrain):
     return TERRAIN_COSTS.get(terrain, DEFAULT_TERRAIN_COST)
+
+
+def terrain_code(terrain):
+    return TERRAIN_CODE_BY_NAME.get(terrain, TERRAIN_CODE_BY_NAME[DEFAULT_TERRAIN])
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from world.batch import TerrainSnapshot, _mapped_region_index, find_paths_batch
+from world.benchmarks import SyntheticTileCache, build_queries
+from world.pathfinding import find_path
+from world.regions import get_region_index
+
+
+class FindPathsBatchTests(TestCase):
+    def setUp(self):
+        self.tile_cache = SyntheticTileCache(chunks=2, density=0.2, seed=3)
+        queries = build_queries(self.tile_cache, count=4, seed=5)
+        self.requests = [query for scenario in queries.values() for query in scenario]
+
+    def test_mapped_region_index_matches_source(self):
+        region_index = get_region_index(self.tile_cache)
+        snapshot = TerrainSnapshot.create(self.tile_cache, region_index)
+        try:
+            mapped = _mapped_region_index(
+                snapshot.memory.buf, snapshot.label_layout, snapshot.open_labels
+            )
+            for start, goal in self.requests:
+                self.assertEqual(mapped.label(*start), region_index.label(*start))
+                self.assertEqual(
+                    mapped.same_region(start, goal), region_index.same_region(start, goal)
+                )
+            del mapped
+        finally:
+            snapshot.close()
+
+    def test_parallel_batch_matches_serial_paths(self):
+        expected = [find_path(self.tile_cache, start, goal) for start, goal in self.requests]
+        self.assertEqual(find_paths_batch(self.tile_cache, self.requests, workers=2), expected)
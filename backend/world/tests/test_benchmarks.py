@@ -0,0 +1,107 @@
+"""Pathfinding benchmark suite over synthetic worlds; needs no database.
+
+Run with ``python manage.py test world``.
+"""
+
+from unittest import TestCase
+
+from world.benchmarks import (
+    SyntheticTileCache,
+    build_queries,
+    run_benchmarks,
+    run_query,
+)
+from world.grid import NEIGHBOR_OFFSETS
+from world.pathfinding import find_path, search_path
+
+MAX_NODES = 100000
+# HPA* routes through portals, so cross-chunk paths may cost a little more
+# than the optimal flat search.
+HIERARCHICAL_SLACK = 1.1
+
+
+def path_cost(tile_cache, path):
+    return sum(tile_cache.get_cost(*step) for step in path[1:])
+
+
+class SyntheticWorldTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tile_cache = SyntheticTileCache(chunks=2, density=0.2, seed=3)
+        cls.queries = build_queries(cls.tile_cache, count=4, seed=3)
+
+    def assert_valid_path(self, path, start, goal):
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], goal)
+        for current, following in zip(path, path[1:]):
+            offset = (following[0] - current[0], following[1] - current[1])
+            self.assertIn(offset, NEIGHBOR_OFFSETS)
+            self.assertIsNotNone(self.tile_cache.get_cost(*following))
+
+    def optimal_cost(self, start, goal):
+        path, _ = search_path(self.tile_cache.get_cost, start, goal, set(), MAX_NODES)
+        self.assertIsNotNone(path)
+        return path_cost(self.tile_cache, path)
+
+    def test_build_queries_covers_every_scenario(self):
+        self.assertEqual(
+            {scenario: len(pairs) for scenario, pairs in self.queries.items()},
+            {"short": 4, "cross_chunk": 4, "unreachable": 4},
+        )
+
+    def test_short_queries_match_flat_search(self):
+        for start, goal in self.queries["short"]:
+            path = find_path(self.tile_cache, start, goal, max_nodes=MAX_NODES)
+            self.assert_valid_path(path, start, goal)
+            self.assertEqual(
+                path_cost(self.tile_cache, path), self.optimal_cost(start, goal)
+            )
+
+    def test_cross_chunk_queries_find_paths(self):
+        for start, goal in self.queries["cross_chunk"]:
+            optimal = self.optimal_cost(start, goal)
+            flat, _ = run_query(self.tile_cache, "flat", start, goal, MAX_NODES)
+            self.assertEqual(path_cost(self.tile_cache, flat), optimal)
+            for mode in ("find_path", "hierarchical"):
+                path, expanded = run_query(self.tile_cache, mode, start, goal, MAX_NODES)
+                self.assert_valid_path(path, start, goal)
+                cost = path_cost(self.tile_cache, path)
+                self.assertTrue(optimal <= cost <= optimal * HIERARCHICAL_SLACK)
+                self.assertGreater(expanded, 0)
+
+    def test_unreachable_queries_return_none(self):
+        for start, goal in self.queries["unreachable"]:
+            for mode in ("find_path", "flat", "hierarchical"):
+                path, _ = run_query(self.tile_cache, mode, start, goal, MAX_NODES)
+                self.assertIsNone(path)
+
+
+class RunBenchmarksTests(TestCase):
+    def test_run_benchmarks_reports_every_scenario(self):
+        for mode in ("find_path", "flat", "hierarchical"):
+            with self.subTest(mode=mode):
+                report = run_benchmarks(
+                    chunks=2,
+                    density=0.2,
+                    seed=1,
+                    queries=3,
+                    max_nodes=MAX_NODES,
+                    mode=mode,
+                    measure_memory=False,
+                )
+                rows = {row["scenario"]: row for row in report["rows"]}
+                self.assertEqual(rows["short"]["found"], 3)
+                self.assertEqual(rows["cross_chunk"]["found"], 3)
+                self.assertEqual(rows["unreachable"]["found"], 0)
+                self.assertTrue(all(row["queries"] == 3 for row in rows.values()))
+
+    def test_build_queries_gives_up_on_a_blocked_world(self):
+        tile_cache = SyntheticTileCache(chunks=1, density=1.0, seed=1)
+        with self.assertRaisesRegex(ValueError, "no passable tile"):
+            build_queries(tile_cache, count=1, max_attempts=50)
+
+    def test_build_queries_gives_up_without_connected_pairs(self):
+        tile_cache = SyntheticTileCache(chunks=2, density=0.95, seed=1)
+        with self.assertRaisesRegex(ValueError, "queries found"):
+            build_queries(tile_cache, count=2, max_attempts=200)
@@ -0,0 +1,60 @@
+import random
+from unittest import TestCase
+
+from world.benchmarks import SyntheticTileCache
+from world.hierarchy import find_path_hierarchical
+from world.pathfinding import find_path, search_path
+
+
+def random_blockers(tile_cache, count, seed, keep=()):
+    rng = random.Random(seed)
+    extent = tile_cache.chunks * tile_cache.size
+    blocked = set()
+    while len(blocked) < count:
+        tile = (rng.randrange(extent), rng.randrange(extent))
+        if tile_cache.get_cost(*tile) is not None and tile not in keep:
+            blocked.add(tile)
+    return blocked
+
+
+class HierarchicalBlockerTests(TestCase):
+    """Portal edges are costed without units; blockers cutting them must not
+    turn a reachable goal into "no path"."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tile_cache = SyntheticTileCache(chunks=3, density=0.3, seed=7)
+        cls.start = (9, 164)
+        cls.goal = (20, 64)
+
+    def assert_path_around(self, path, blocked):
+        self.assertIsNotNone(path)
+        self.assertEqual((path[0], path[-1]), (self.start, self.goal))
+        self.assertFalse(set(path) & blocked)
+
+    def test_blocked_corridors_still_find_a_path(self):
+        # Each of these blocker sets cuts a corridor the portal graph relies on.
+        for seed in (55, 63, 68, 185):
+            with self.subTest(seed=seed):
+                blocked = random_blockers(
+                    self.tile_cache, 300, seed, keep=(self.start, self.goal)
+                )
+                flat, _ = search_path(
+                    self.tile_cache.get_cost, self.start, self.goal, blocked, 200000
+                )
+                self.assertIsNotNone(flat)
+                self.assert_path_around(
+                    find_path(self.tile_cache, self.start, self.goal, blocked=blocked),
+                    blocked,
+                )
+                self.assert_path_around(
+                    find_path_hierarchical(
+                        self.tile_cache, self.start, self.goal, blocked=blocked
+                    ),
+                    blocked,
+                )
+
+    def test_unblocked_search_finds_a_path(self):
+        path = find_path_hierarchical(self.tile_cache, self.start, self.goal)
+        self.assert_path_around(path, set())
@@ -0,0 +1,77 @@
+import itertools
+import random
+from unittest import TestCase
+
+from world.benchmarks import _synthetic_grid
+from world.grid import DEFAULT_CHUNK_SIZE, GridCache
+from world.pathfinding import LAZY_SEARCH_MAX_CHUNKS, find_path
+from world.regions import same_region
+
+
+class LazyTileCache(GridCache):
+    """Starts with chunk (0, 0) and generates chunks within ``radius`` on fetch,
+    bumping its version the way ``TileCache`` does."""
+
+    # Path and region caches are module-wide; each instance is its own "match".
+    _ids = itertools.count(1)
+
+    def __init__(self, radius):
+        super().__init__()
+        self.id = f"lazy-test-{next(self._ids)}"
+        self.radius = radius
+        self.version = 0
+        self.chunks = {(0, 0): self._make(0, 0)}
+        self.generated = []
+
+    def cache_key(self):
+        return (self.id, self.version)
+
+    def chunk_keys(self):
+        return sorted(self.chunks)
+
+    def may_generate(self, chunk_q, chunk_r):
+        return max(abs(chunk_q), abs(chunk_r)) < self.radius
+
+    def _fetch_grid(self, chunk_q, chunk_r):
+        return self._fetch_grids([(chunk_q, chunk_r)]).get((chunk_q, chunk_r))
+
+    def _fetch_grids(self, keys, generate=True):
+        grids = {}
+        for key in keys:
+            if key in self.chunks:
+                grids[key] = self.chunks[key]
+            elif not self.may_generate(*key):
+                grids[key] = None
+            elif generate:
+                grids[key] = self.chunks[key] = self._make(*key)
+                self.generated.append(key)
+                self.version += 1
+                self._absent.clear()
+                self.region_index = None
+                self.portal_graph = None
+        return grids
+
+    def _make(self, chunk_q, chunk_r):
+        rng = random.Random(chunk_q * 1000 + chunk_r)
+        return _synthetic_grid(chunk_q, chunk_r, DEFAULT_CHUNK_SIZE, 0.1, rng)
+
+
+class LazySearchTests(TestCase):
+    def test_unexplored_goal_is_not_refused(self):
+        tile_cache = LazyTileCache(radius=5)
+        self.assertTrue(same_region(tile_cache, (10, 10), (200, 10)))
+        self.assertEqual(tile_cache.generated, [])
+
+    def test_long_search_generates_only_chunks_towards_the_goal(self):
+        tile_cache = LazyTileCache(radius=5)
+        path = find_path(tile_cache, (10, 10), (200, 10))
+        self.assertIsNotNone(path)
+        self.assertEqual(path[-1], (200, 10))
+        self.assertLessEqual(len(tile_cache.generated), LAZY_SEARCH_MAX_CHUNKS + 1)
+        self.assertTrue(all(chunk_r == 0 for _, chunk_r in tile_cache.generated))
+
+    def test_chunks_outside_the_radius_stay_unreachable(self):
+        tile_cache = LazyTileCache(radius=1)
+        self.assertFalse(same_region(tile_cache, (10, 10), (200, 10)))
+        self.assertIsNone(find_path(tile_cache, (10, 10), (200, 10)))
+        self.assertEqual(tile_cache.generated, [])
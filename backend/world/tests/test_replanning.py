@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from world.benchmarks import SyntheticTileCache, build_queries
+from world.caches import invalidate_match
+from world.pathfinding import _PATH_CACHE, search_path
+from world.replanning import _PLANNERS, DStarLite, replan_path
+
+MAX_NODES = 100000
+
+
+def path_cost(tile_cache, path):
+    return sum(tile_cache.get_cost(*step) for step in path[1:])
+
+
+class DStarLiteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tile_cache = SyntheticTileCache(chunks=2, density=0.2, seed=3)
+        cls.start, cls.goal = build_queries(cls.tile_cache, count=1, seed=3)["cross_chunk"][0]
+
+    def optimal_cost(self, start, blocked):
+        path, _ = search_path(self.tile_cache.get_cost, start, self.goal, blocked, MAX_NODES)
+        return path_cost(self.tile_cache, path)
+
+    def test_first_plan_is_optimal(self):
+        planner = DStarLite(self.tile_cache, self.start, self.goal, max_nodes=MAX_NODES)
+        path = planner.plan(self.start, set())
+        self.assertEqual((path[0], path[-1]), (self.start, self.goal))
+        self.assertEqual(path_cost(self.tile_cache, path), self.optimal_cost(self.start, set()))
+
+    def test_replan_routes_around_new_blocker_with_less_work(self):
+        planner = DStarLite(self.tile_cache, self.start, self.goal, max_nodes=MAX_NODES)
+        path = planner.plan(self.start, set())
+        initial = planner.expanded
+
+        blocked = {path[len(path) // 2]}
+        replanned = planner.plan(self.start, blocked)
+        self.assertTrue(blocked.isdisjoint(replanned))
+        self.assertEqual(
+            path_cost(self.tile_cache, replanned), self.optimal_cost(self.start, blocked)
+        )
+        self.assertLess(planner.expanded - initial, initial)
+
+    def test_replan_from_a_later_start_follows_the_route(self):
+        planner = DStarLite(self.tile_cache, self.start, self.goal, max_nodes=MAX_NODES)
+        path = planner.plan(self.start, set())
+        moved = path[3]
+        replanned = planner.plan(moved, set())
+        self.assertEqual(replanned[0], moved)
+        self.assertEqual(path_cost(self.tile_cache, replanned), self.optimal_cost(moved, set()))
+
+
+class KeyedTileCache(SyntheticTileCache):
+    def cache_key(self):
+        return ("replan-test", 1)
+
+
+class ReplanPathTests(TestCase):
+    def setUp(self):
+        self.tile_cache = KeyedTileCache(chunks=2, density=0.2, seed=3)
+        self.start, self.goal = build_queries(self.tile_cache, count=1, seed=3)["short"][0]
+        invalidate_match("replan-test")
+
+    def cached(self, max_nodes):
+        query = (self.start, self.goal, frozenset(), max_nodes)
+        return _PATH_CACHE.get(self.tile_cache.cache_key() + query)
+
+    def test_search_cut_off_by_budget_is_not_cached(self):
+        self.assertIsNone(replan_path(self.tile_cache, 1, self.start, self.goal, max_nodes=1))
+        self.assertIsNone(self.cached(1))
+        self.assertIsNone(_PLANNERS.get(self.tile_cache.cache_key() + (1, self.goal)))
+
+    def test_completed_search_is_cached_with_its_planner(self):
+        path = replan_path(self.tile_cache, 1, self.start, self.goal, max_nodes=MAX_NODES)
+        self.assertEqual(list(self.cached(MAX_NODES)), path)
+        self.assertIsNotNone(_PLANNERS.get(self.tile_cache.cache_key() + (1, self.goal)))
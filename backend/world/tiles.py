@@ -1,38 +1,195 @@
+import glob
+import os
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from world.caches import LRUCache, VersionedCache
+from world.chunk_store import chunk_store_key, get_chunk_store
+from world.generation import generate_missing_chunks, lazy_chunk_allowed
+from world.grid import ChunkGrid, GridCache
 from world.models import Chunk
+from world.snapshots import open_snapshot_file, write_snapshot_file
+
+# Parsed chunk grids shared by every TileCache in the process, keyed by
+# (match_id, chunk_q, chunk_r, terrain_version).
+_CHUNK_GRIDS = LRUCache(
+    max_entries=65536,
+    max_bytes=settings.CHUNK_CACHE_MAX_BYTES,
+    sizeof=lambda grid: grid.nbytes,
+)
 
-DEFAULT_CHUNK_SIZE = 64
+# Read-only mappings of per-match snapshot files, by match id and terrain version.
+_MAPPED_TERRAIN = VersionedCache(max_entries=64)
 
 
-class TileCache:
+class TileCache(GridCache):
     def __init__(self, match):
+        super().__init__()
         self.match = match
-        self._chunk_cache = {}
-        self._tile_index_cache = {}
-
-    def _chunk_key(self, chunk_q, chunk_r):
-        return f"{chunk_q},{chunk_r}"
-
-    def _load_chunk(self, chunk_q, chunk_r):
-        key = self._chunk_key(chunk_q, chunk_r)
-        if key in self._chunk_cache:
-            return self._chunk_cache[key]
-
-        try:
-            chunk = Chunk.objects.get(match=self.match, chunk_q=chunk_q, chunk_r=chunk_r)
-        except Chunk.DoesNotExist:
-            self._chunk_cache[key] = None
-            self._tile_index_cache[key] = {}
-            return None
-
-        cells = chunk.tiles.get("cells", [])
-        tile_index = {(cell["q"], cell["r"]): cell for cell in cells}
-        self._chunk_cache[key] = chunk
-        self._tile_index_cache[key] = tile_index
-        return chunk
-
-    def get_tile(self, q, r):
-        chunk_q = q // DEFAULT_CHUNK_SIZE
-        chunk_r = r // DEFAULT_CHUNK_SIZE
-        key = self._chunk_key(chunk_q, chunk_r)
-        self._load_chunk(chunk_q, chunk_r)
-        return self._tile_index_cache.get(key, {}).get((q, r))
+        self._mapped = None
+        self._mapped_checked = False
+
+    def cache_key(self):
+        return self.match.id, self.match.terrain_version
+
+    def chunk_keys(self):
+        mapped = self._mapped_terrain()
+        if mapped is not None:
+            return mapped.chunk_keys()
+        return list(
+            Chunk.objects.filter(match=self.match)
+            .order_by("chunk_q", "chunk_r")
+            .values_list("chunk_q", "chunk_r")
+        )
+
+    def may_generate(self, chunk_q, chunk_r):
+        return lazy_chunk_allowed(self.match, chunk_q, chunk_r)
+
+    def _fetch_grid(self, chunk_q, chunk_r):
+        return self._fetch_grids([(chunk_q, chunk_r)]).get((chunk_q, chunk_r))
+
+    def _fetch_grids(self, keys, generate=True):
+        """Load grids for ``keys``, generating missing ones when the match is lazy.
+
+        Prefetches pass ``generate=False`` so a search box never generates
+        chunks the search does not actually step into.
+        """
+        grids = self._load_grids(keys)
+        lazy = [
+            key
+            for key, grid in grids.items()
+            if grid is None and self.may_generate(*key)
+        ]
+        if not lazy:
+            return grids
+        if not generate:
+            for key in lazy:
+                del grids[key]
+            return grids
+        terrain_version = self.match.terrain_version
+        generate_missing_chunks(self.match, lazy)
+        if self.match.terrain_version != terrain_version:
+            # Region and portal data built for the old version miss the new chunks.
+            self._absent.clear()
+            self.region_index = None
+            self.portal_graph = None
+            self._mapped = None
+            self._mapped_checked = False
+        grids.update(self._load_grids(lazy))
+        return grids
+
+    def _load_grids(self, keys):
+        mapped = self._mapped_terrain()
+        if mapped is not None:
+            return {key: mapped.grid(*key) for key in keys}
+
+        grids = {}
+        pending = set()
+        for chunk_q, chunk_r in keys:
+            grid = _CHUNK_GRIDS.get(self._grid_key(chunk_q, chunk_r))
+            if grid is None:
+                pending.add((chunk_q, chunk_r))
+            grids[(chunk_q, chunk_r)] = grid
+        if not pending:
+            return grids
+
+        store = get_chunk_store()
+        if store is not None:
+            store_keys = {self._store_key(*key): key for key in pending}
+            for store_key, data in store.get_many(store_keys).items():
+                key = store_keys[store_key]
+                grid = ChunkGrid.from_bytes(key[0], key[1], data)
+                _CHUNK_GRIDS.set(self._grid_key(*key), grid)
+                grids[key] = grid
+                pending.discard(key)
+            if not pending:
+                return grids
+
+        fetched = {}
+        chunks = Chunk.objects.filter(match=self.match).only(
+            "chunk_q", "chunk_r", "size", "tiles_blob"
+        )
+        if len(pending) == 1:
+            chunk_q, chunk_r = next(iter(pending))
+            chunks = chunks.filter(chunk_q=chunk_q, chunk_r=chunk_r)
+        else:
+            chunks = chunks.filter(
+                chunk_q__range=(min(key[0] for key in pending), max(key[0] for key in pending)),
+                chunk_r__range=(min(key[1] for key in pending), max(key[1] for key in pending)),
+            )
+        for chunk in chunks:
+            key = (chunk.chunk_q, chunk.chunk_r)
+            if key not in pending:
+                continue
+            grid = load_chunk_grid(chunk)
+            _CHUNK_GRIDS.set(self._grid_key(*key), grid)
+            grids[key] = grid
+            if store is not None:
+                fetched[self._store_key(*key)] = bytes(chunk.tiles_blob or grid.to_bytes())
+        if fetched:
+            # Rows read inside a transaction (e.g. chunks generated lazily during
+            # resolve_turns) may still roll back along with the terrain_version
+            # in their key, so only share them once committed.
+            transaction.on_commit(partial(store.set_many, fetched))
+        return grids
+
+    def _mapped_terrain(self):
+        if not self._mapped_checked:
+            self._mapped = open_terrain_snapshot(self.match)
+            self._mapped_checked = True
+        return self._mapped
+
+    def _grid_key(self, chunk_q, chunk_r):
+        return self.match.id, chunk_q, chunk_r, self.match.terrain_version
+
+    def _store_key(self, chunk_q, chunk_r):
+        return chunk_store_key(self.match.id, self.match.terrain_version, chunk_q, chunk_r)
+
+
+def load_chunk_grid(chunk):
+    """Grid for a chunk row, from ``tiles_blob`` or the legacy ``tiles`` cells."""
+    if chunk.tiles_blob:
+        return ChunkGrid.from_bytes(chunk.chunk_q, chunk.chunk_r, chunk.tiles_blob)
+    return ChunkGrid.from_cells(
+        chunk.chunk_q, chunk.chunk_r, chunk.size, chunk.tiles.get("cells", [])
+    )
+
+
+def terrain_snapshot_path(match_id, terrain_version):
+    return os.path.join(
+        settings.TERRAIN_SNAPSHOT_DIR, f"match-{match_id}-v{terrain_version}.terrain"
+    )
+
+
+def open_terrain_snapshot(match):
+    """Mapped terrain for ``match`` at its current version, or None without a snapshot."""
+    if not settings.TERRAIN_SNAPSHOT_DIR:
+        return None
+    mapped = _MAPPED_TERRAIN.get(match.id, match.terrain_version)
+    if mapped is not None:
+        return mapped
+    path = terrain_snapshot_path(match.id, match.terrain_version)
+    try:
+        mapped, _, _ = open_snapshot_file(path)
+    except (OSError, ValueError):
+        return None
+    _MAPPED_TERRAIN.set(match.id, match.terrain_version, mapped)
+    return mapped
+
+
+def write_terrain_snapshot(match):
+    """Write the snapshot file for ``match`` and drop files from older versions."""
+    if not settings.TERRAIN_SNAPSHOT_DIR:
+        return None
+    os.makedirs(settings.TERRAIN_SNAPSHOT_DIR, exist_ok=True)
+    path = terrain_snapshot_path(match.id, match.terrain_version)
+    write_snapshot_file(
+        path, TileCache(match).all_grids(), match.id, match.terrain_version
+    )
+    pattern = os.path.join(settings.TERRAIN_SNAPSHOT_DIR, f"match-{match.id}-v*.terrain")
+    for stale_path in glob.glob(pattern):
+        if stale_path != path:
+            os.remove(stale_path)
+    return path
@@ -32,10 +32,45 @@ export function getChunk(matchId, chunkQ, chunkR, turnNumber) {
   return request(`/api/matches/${matchId}/chunks/${chunkQ}/${chunkR}/${params}`);
 }
 
+function turnQuery(turnNumber) {
+  return Number.isFinite(turnNumber) && turnNumber > 0 ? `?turn=${turnNumber}` : "";
+}
+
+export function getChunkTerrain(matchId, chunkQ, chunkR) {
+  return request(`/api/matches/${matchId}/chunks/${chunkQ}/${chunkR}/terrain/`);
+}
+
+export function getChunkOwnership(matchId, chunkQ, chunkR, turnNumber) {
+  return request(
+    `/api/matches/${matchId}/chunks/${chunkQ}/${chunkR}/ownership/${turnQuery(turnNumber)}`
+  );
+}
+
+export function getOwnershipChanges(matchId, fromTurn, toTurn) {
+  return request(`/api/matches/${matchId}/ownership/changes/?from=${fromTurn}&to=${toTurn}`);
+}
+
+export function getViewport(matchId, bounds, turnNumber) {
+  const params = new URLSearchParams({
+    from_q: bounds.fromQ,
+    to_q: bounds.toQ,
+    from_r: bounds.fromR,
+    to_r: bounds.toR,
+  });
+  if (Number.isFinite(turnNumber) && turnNumber > 0) {
+    params.set("turn", turnNumber);
+  }
+  return request(`/api/matches/${matchId}/chunks/?${params}`);
+}
+
 export function getTurnState(matchId, turnNumber) {
   return request(`/api/matches/${matchId}/turns/${turnNumber}/state/`);
 }
 
+export function getReachable(matchId, unitId) {
+  return request(`/api/matches/${matchId}/units/${unitId}/reachable/`);
+}
+
 export function queueOrders(matchId, payload) {
   return request(`/api/matches/${matchId}/queue-orders/`, {
     method: "POST",